@@ -0,0 +1,76 @@
+# Compares two results files written by benchmarks/run.py, case by case:
+#
+#   python benchmarks/compare.py baseline.json results.json [--threshold 10]
+#
+# Exits with status 1 if any case got slower (steps/sec or reset latency) or bigger by more
+# than the threshold percentage.
+
+import sys, json, argparse
+
+METRICS = [
+    # name, higher is better
+    ("steps_per_sec", True),
+    ("reset_us_mean", False),
+    ("mem_bytes", False)
+]
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+
+    return data["meta"], dict((case_key(r), r) for r in data["results"])
+
+def case_key(result):
+    return (result["env"], json.dumps(result["params"], sort_keys=True))
+
+def change(old, new, higher_is_better):
+    # Percent change, positive when new is better
+    if old == 0:
+        return 0.0
+
+    pct = (new - old) / float(old) * 100.0
+    return pct if higher_is_better else -pct
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two smt-env benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("results")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args(argv)
+
+    old_meta, old = load(args.baseline)
+    new_meta, new = load(args.results)
+
+    print("baseline: {0} ({1})".format(old_meta.get("commit"), old_meta.get("time")))
+    print("results:  {0} ({1})".format(new_meta.get("commit"), new_meta.get("time")))
+    print()
+
+    regressions = 0
+
+    print("{0:<12}{1:<60}{2:>16}{3:>16}{4:>16}".format("env", "params", "steps/s", "reset", "memory"))
+    for key in sorted(set(old) & set(new)):
+        cells = []
+        for metric, higher_is_better in METRICS:
+            pct = change(old[key][metric], new[key][metric], higher_is_better)
+
+            flag = ""
+            if pct < -args.threshold:
+                flag = " !"
+                regressions += 1
+
+            cells.append("{0:+.1f}%{1}".format(pct, flag))
+
+        print("{0:<12}{1:<60}{2:>16}{3:>16}{4:>16}".format(key[0], key[1], *cells))
+
+    missing = set(old) ^ set(new)
+    if missing:
+        print()
+        print("{0} cases only present in one of the files".format(len(missing)))
+
+    print()
+    print("{0} regressions beyond {1}%".format(regressions, args.threshold))
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# Import-time budgets: what a fresh process (a sweep or vector env worker, a short evaluation
+# job) pays before its first step.
+#
+#   python benchmarks/import_time.py [--repeat 5] [--scale 1.0]
+#
+# Every case runs in a new interpreter, timing its statements after interpreter startup, and
+# records which of the heavy modules they loaded. The best of --repeat runs is compared to the
+# case's budget (times --scale, for slower machines). Exits with status 1 if a case is over its
+# budget or loaded a module it must not.
+
+import os, sys, json, argparse, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ["numpy", "gym", "pygame"]
+
+SCENARIO = '{"width": 8, "height": 8, "cellsize": 10, "player": {"x": 4, "y": 4}, "enemies": [{"id": "a", "x": 0, "y": 0, "behavior": "chase", "action_rate": 1}]}'
+
+CASES = [
+    # name, statements, budget (ms), modules that must stay unloaded
+    ("import smtenv", "import smtenv", 20, ["numpy", "gym", "pygame"]),
+    ("import ATESim", "from smtenv.envs import ATESim", 250, ["gym", "pygame"]),
+    ("headless ATESim step",
+        "from smtenv.envs import ATESim\n"
+        "game = ATESim(" + SCENARIO + ")\n"
+        "game.setup(display=False)\n"
+        "game.init()\n"
+        "game.step(33.3)",
+        300, ["gym", "pygame"]),
+    ("import SMTEnv", "from smtenv import SMTEnv", 500, ["pygame"]),
+    ("headless SMTEnv step",
+        "from smtenv import SMTEnv\n"
+        "from smtenv.envs import ATESim\n"
+        "env = SMTEnv(ATESim, display_screen=False, kwargs={'config': " + SCENARIO + "})\n"
+        "env.reset()\n"
+        "env.step(0)",
+        550, ["pygame"]),
+]
+
+CHILD = """
+import sys, json, time
+start = time.perf_counter()
+exec(compile({code!r}, "<case>", "exec"), {{}})
+ms = (time.perf_counter() - start) * 1000.0
+print(json.dumps({{"ms": ms, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def run_case(code):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT] + [p for p in [env.get("PYTHONPATH")] if p])
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD.format(code=code, heavy=HEAVY)],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+    )
+
+    # Libraries' own notices on stderr are only shown when the case fails
+    if proc.returncode != 0:
+        raise Exception("Case failed:\n{0}".format(proc.stderr))
+
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import time of smt-env against its budgets")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case, the best one counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for every budget")
+    args = parser.parse_args(argv)
+
+    failures = 0
+
+    print("{0:<24}{1:>10}{2:>10}  {3}".format("case", "ms", "budget", "loaded"))
+    for name, code, budget, forbidden in CASES:
+        runs = [run_case(code) for _ in range(args.repeat)]
+
+        ms = min(run["ms"] for run in runs)
+        loaded = runs[0]["loaded"]
+
+        budget = budget * args.scale
+        problems = []
+
+        if ms > budget:
+            problems.append("over budget")
+
+        unexpected = [m for m in loaded if m in forbidden]
+        if unexpected:
+            problems.append("loaded " + ", ".join(unexpected))
+
+        failures += bool(problems)
+
+        print("{0:<24}{1:>10.1f}{2:>10.0f}  {3}{4}".format(
+            name, ms, budget, ", ".join(loaded) or "-", "  ! " + "; ".join(problems) if problems else ""
+        ))
+
+    print()
+    print("{0} of {1} cases failed".format(failures, len(CASES)))
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
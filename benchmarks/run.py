@@ -0,0 +1,204 @@
+# Throughput / latency / memory benchmarks for the bundled environments.
+#
+#   python benchmarks/run.py --out results.json
+#   python benchmarks/compare.py baseline.json results.json
+#
+# Every case builds one SMTEnv and measures its construction memory, reset latency and
+# steps/sec under random actions. Displayed cases use SDL's dummy video driver and an
+# effectively unlimited fps, so they measure rendering cost rather than frame throttling.
+# Memory is what Python's tracemalloc sees, pixel buffers held by SDL are not included.
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import json, time, platform, argparse, itertools, subprocess, tracemalloc
+
+import numpy as np
+
+from smtenv import SMTEnv
+from smtenv.envs import ATESim, AvoidGame, AvoidSwarm
+
+BEHAVIORS = ["chase", "xmirror", "ymirror"]
+
+def ate_scenario(grid, enemies, vision):
+    # Deterministic scenario: player in the middle, enemies spread along the diagonals
+    cellsize = max(2, 400 // grid)
+
+    scenario = {
+        "width": grid,
+        "height": grid,
+        "cellsize": cellsize,
+        "player": {"x": grid // 2, "y": grid // 2, "vision": vision},
+        "enemies": []
+    }
+
+    for i in range(enemies):
+        x = (i * 7919) % grid
+        y = (i * 104729 + grid // 3) % grid
+        if (x, y) == (grid // 2, grid // 2):
+            x = (x + 1) % grid
+
+        scenario["enemies"].append({
+            "id": str(i), "x": x, "y": y, "behavior": BEHAVIORS[i % len(BEHAVIORS)], "action_rate": 1 + i % 3
+        })
+
+    return scenario
+
+def ate_cases(args):
+    for grid, enemies, vision, display, obs in itertools.product(args.grid, args.enemies, args.vision, args.display, args.obs):
+        params = {"grid": grid, "enemies": enemies, "vision": vision, "display": display, "obs": obs}
+
+        kwargs = {"config": ate_scenario(grid, enemies, vision)}
+        env_args = {"display_screen": display, "fps": args.display_fps if display else 30, "kwargs": kwargs}
+
+        if obs == "array":
+            env_args["obs_type"] = "array"
+        elif obs == "flatten":
+            env_args["state_preprocessor"] = ATESim.state_flatten
+
+        yield "ATESim", params, lambda env_args=env_args: SMTEnv(ATESim, **env_args)
+
+def avoid_cases(args):
+    for size, display, obs in itertools.product(args.size, args.display, args.obs):
+        if obs == "flatten":
+            continue
+
+        params = {"size": size, "display": display, "obs": obs}
+        env_args = {"display_screen": display, "fps": args.display_fps if display else 30,
+                    "kwargs": {"width": size, "height": size}, "obs_type": obs}
+
+        yield "AvoidGame", params, lambda env_args=env_args: SMTEnv(AvoidGame, **env_args)
+
+    for n, separation, display, obs in itertools.product(args.swarm, args.separation, args.display, args.obs):
+        if obs == "flatten":
+            continue
+
+        # Cases without separation keep the parameters they had before it existed
+        params = {"size": 512, "enemies": n, "display": display, "obs": obs}
+        if separation:
+            params["separation"] = True
+
+        env_args = {"display_screen": display, "fps": args.display_fps if display else 30,
+                    "kwargs": {"width": 512, "height": 512, "num_enemies": n, "separation": separation}, "obs_type": obs}
+
+        yield "AvoidSwarm", params, lambda env_args=env_args: SMTEnv(AvoidSwarm, **env_args)
+
+def measure(make_env, steps, resets, seed=0):
+    # Memory retained by one constructed and reset env
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    env = make_env()
+    env.reset()
+    mem = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    reset_times = []
+    for _ in range(resets):
+        start = time.perf_counter()
+        env.reset()
+        reset_times.append(time.perf_counter() - start)
+
+    rng = np.random.RandomState(seed)
+    actions = rng.randint(0, env.action_space.n, size=steps)
+
+    env.reset()
+    episodes = 0
+
+    start = time.perf_counter()
+    for a in actions:
+        _, _, done, _ = env.step(a)
+        if done:
+            env.reset()
+            episodes += 1
+    elapsed = time.perf_counter() - start
+
+    env.close()
+
+    reset_times = np.array(reset_times) * 1e6
+
+    return {
+        "steps_per_sec":    steps / elapsed,
+        "step_us":          elapsed / steps * 1e6,
+        "reset_us_mean":    float(reset_times.mean()),
+        "reset_us_p50":     float(np.percentile(reset_times, 50)),
+        "reset_us_p99":     float(np.percentile(reset_times, 99)),
+        "mem_bytes":        int(mem),
+        "episodes":         episodes,
+        "steps":            steps
+    }
+
+def metadata():
+    import pygame, gym
+
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit":   commit,
+        "time":     time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python":   platform.python_version(),
+        "platform": platform.platform(),
+        "numpy":    np.__version__,
+        "pygame":   pygame.version.ver,
+        "gym":      gym.__version__
+    }
+
+def parse_list(cast):
+    def parse(text):
+        return [None if v == "none" else cast(v) for v in text.split(",")]
+    return parse
+
+def parse_bool(v):
+    return v in ("1", "true", "on", "yes")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bundled smt-env environments")
+    parser.add_argument("--out", default="bench_results.json", help="results file (JSON)")
+    parser.add_argument("--env", default="ATESim,AvoidGame,AvoidSwarm", help="environments to run")
+    parser.add_argument("--steps", type=int, default=5000, help="steps per headless case")
+    parser.add_argument("--display-steps", type=int, default=300, help="steps per displayed case")
+    parser.add_argument("--display-fps", type=int, default=1000000, help="fps limit of displayed cases")
+    parser.add_argument("--resets", type=int, default=200, help="resets timed per case")
+    parser.add_argument("--grid", type=parse_list(int), default=[8, 32, 128], help="ATESim grid sizes")
+    parser.add_argument("--enemies", type=parse_list(int), default=[1, 8, 32], help="ATESim enemy counts")
+    parser.add_argument("--vision", type=parse_list(int), default=[None, 3], help="ATESim vision radii ('none' for unlimited)")
+    parser.add_argument("--size", type=parse_list(int), default=[200, 512], help="AvoidGame screen sizes")
+    parser.add_argument("--swarm", type=parse_list(int), default=[10, 100, 1000], help="AvoidSwarm enemy counts")
+    parser.add_argument("--separation", type=parse_list(parse_bool), default=[False, True], help="AvoidSwarm enemy separation settings")
+    parser.add_argument("--display", type=parse_list(parse_bool), default=[False, True], help="display settings, e.g. 'off,on'")
+    parser.add_argument("--obs", type=parse_list(str), default=["dict", "flatten", "array"], help="observation modes")
+    parser.add_argument("--quick", action="store_true", help="small sweep for a fast sanity check")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.grid, args.enemies, args.vision = [8, 64], [1, 16], [None, 3]
+        args.size, args.swarm = [200], [100]
+        args.steps, args.display_steps, args.resets = 1000, 100, 50
+
+    envs = set(args.env.split(","))
+    cases = [case for case in itertools.chain(ate_cases(args), avoid_cases(args)) if case[0] in envs]
+
+    results = []
+    for i, (name, params, make_env) in enumerate(cases):
+        steps = args.display_steps if params["display"] else args.steps
+
+        result = {"env": name, "params": params}
+        result.update(measure(make_env, steps, args.resets))
+        results.append(result)
+
+        print("[{0}/{1}] {2} {3}: {4:.0f} steps/s, reset {5:.1f} us, {6} bytes".format(
+            i + 1, len(cases), name, params, result["steps_per_sec"], result["reset_us_mean"], result["mem_bytes"]
+        ))
+
+    with open(args.out, "w") as f:
+        json.dump({"meta": metadata(), "results": results}, f, indent=2)
+
+    print("Wrote {0} results to {1}".format(len(results), args.out))
+
+if __name__ == "__main__":
+    main()
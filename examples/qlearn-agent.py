@@ -1,5 +1,6 @@
 from smtenv import SMTEnv
 from smtenv.envs.atesim import ATESim
+from smtenv.rollout import RolloutCollector
 
 import numpy as np
 from collections import defaultdict
@@ -67,6 +68,13 @@ class QLearnAgent(object):
         # self.last_action = next_action
         # return self.last_action
 
+    def observe(self, ob, action, reward, next_ob, done):
+        for last_state in self.state_parse(ob):
+            for next_state in self.state_parse(next_ob):
+                next_action = np.argmax(self.q[next_state])
+                td = reward + self.gamma * self.q[next_state][next_action] - self.q[last_state][action]
+                self.q[last_state][action] += self.alpha * td
+
 def ate_state_parser(state):
     states = []
     for i in range(2, len(state), 2):
@@ -77,49 +85,18 @@ def ate_state_parser(state):
 
 
 def train(agent, env, num_episodes = 100, episode_len = 100):
-    episode_results = dict()
-    episode_results["total_rwd"] = []
-    episode_results["length"] = []
-
-    for episode_i in range(num_episodes):
-        ob = env.reset()
-
-        reward = 0
-        total_rwd = 0
-
-        done = False
-
-        episode_log = {
-            "rwd": list()
-        }
-
-        steps = 0
+    # The agent learns in its observe hook, the collector keeps the transitions
+    rollout = RolloutCollector(env).collect(agent, episodes=num_episodes, episode_length=episode_len)
 
-        print("Starting Episode {0}".format(episode_i))
-        for _ in range(episode_len):
-            action = agent.act(ob, reward, done)
-            next_ob, reward, done, _ = env.step(action)
-
-            episode_log["rwd"].append(reward)
-            total_rwd += reward
-
-            for last_state in agent.state_parse(ob):
-                for next_state in agent.state_parse(next_ob):
-                    next_action = np.argmax(agent.q[next_state])
-                    td = reward + agent.gamma * agent.q[next_state][next_action] - agent.q[last_state][action]
-                    agent.q[last_state][action] += agent.alpha * td
-
-            if done:
-                break
-
-            steps += 1
-
-            ob = next_ob
-        
-        episode_log["total_rwd"] = total_rwd
-        episode_results[episode_i] = episode_log
-        episode_results["total_rwd"].append(total_rwd)
-        episode_results["length"].append(steps)
+    episode_results = dict()
+    episode_results["total_rwd"] = rollout.episode_returns
+    # Steps survived: the step an episode ended on is not counted
+    episode_results["length"] = rollout.episode_lengths - rollout.episode_dones
+    episode_results["rollout"] = rollout
+
+    ends = np.cumsum(rollout.episode_lengths)
+    for episode_i, (rewards, total_rwd) in enumerate(zip(np.split(rollout.rewards, ends[:-1]), rollout.episode_returns)):
+        episode_results[episode_i] = {"rwd": rewards.tolist(), "total_rwd": total_rwd}
 
     return episode_results
 
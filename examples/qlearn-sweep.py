@@ -0,0 +1,78 @@
+# Sweeps the Q-learning example over scenario variants, learning rates, discounts and seeds:
+#
+#   python examples/qlearn-sweep.py --out sweep.jsonl --workers 64
+#
+# Results stream into the JSON lines file as runs finish; running the same command again
+# after an interruption only runs the cells that have no result yet.
+
+import os, argparse, importlib.util
+
+import numpy as np
+
+from smtenv.envs.atesim import ATESim
+from smtenv.sweep import grid, run_sweep, worker_env
+
+def load_example():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "qlearn-agent.py")
+
+    spec = importlib.util.spec_from_file_location("qlearn_agent", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+def scenario(size, behavior, action_rate):
+    # The example's scenario, resized and with a different pursuer
+    return {
+        "width": size,
+        "height": size,
+        "cellsize": 10,
+        "player": {"x": 0, "y": 0, "vision": 2},
+        "enemies": [
+            {"id": "A", "x": size // 2, "y": size // 2, "behavior": behavior, "action_rate": action_rate}
+        ]
+    }
+
+def run(cell):
+    example = load_example()
+
+    env = worker_env(
+        ATESim, {"config": scenario(cell["size"], cell["behavior"], cell["action_rate"])},
+        display_screen=False, state_preprocessor=ATESim.state_flatten
+    )
+    env.reset(seed=cell["seed"])
+    np.random.seed(cell["seed"])
+
+    agent = example.QLearnAgent(env.action_space, alpha=cell["alpha"], gamma=cell["gamma"], state_parse=example.ate_state_parser)
+    results = example.train(agent, env, num_episodes=cell["episodes"])
+
+    returns = np.asarray(results["total_rwd"], dtype=float)
+    lengths = np.asarray(results["length"])
+    tail = max(1, len(returns) // 10)
+
+    return {
+        "mean_return":      float(returns.mean()),
+        "final_return":     float(returns[-tail:].mean()),
+        "mean_length":      float(lengths.mean()),
+        "final_length":     float(lengths[-tail:].mean())
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep of the Q-learning example")
+    parser.add_argument("--out", default="qlearn-sweep.jsonl", help="results file (JSON lines), also read to resume")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--episodes", type=int, default=1000, help="training episodes per run")
+    parser.add_argument("--seeds", type=int, default=3, help="seeds per configuration")
+    args = parser.parse_args()
+
+    cells = grid(
+        size=[4, 6],
+        behavior=["chase", "xmirror"],
+        action_rate=[2, 6],
+        alpha=[0.1, 0.3, 0.6],
+        gamma=[0.1, 0.5, 0.9],
+        seed=list(range(args.seeds)),
+        episodes=[args.episodes]
+    )
+
+    run_sweep(run, cells, args.out, max_workers=args.workers)
@@ -16,5 +16,5 @@ setup(
     packages=find_packages(),
     keywords = ['AI', 'OpenAI', 'PyGame', 'RL'],
     long_description = long_desc,
-    install_requires=["numpy", "gym", "pygame"]
+    install_requires=["numpy", "gym", "pygame>=2"]
 )
\ No newline at end of file
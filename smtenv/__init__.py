@@ -1,4 +1,28 @@
-from .smtenv import SMTEnv
-from smtenv.basegame import BaseGame
+import importlib
 
-import smtenv.envs
\ No newline at end of file
+# Names are imported on first use, so "import smtenv" (in a worker process, or a short job that
+# only needs one game) does not pay for gym, pygame and every game up front
+_exports = {
+    "SMTEnv":           "smtenv.smtenv",
+    "BaseGame":         "smtenv.basegame",
+    "SMTVectorEnv":     "smtenv.vecenv",
+    "RenderScheduler":  "smtenv.scheduler",
+    "RolloutCollector": "smtenv.rollout",
+}
+
+__all__ = list(_exports) + ["envs"]
+
+def __getattr__(name):
+    if name == "envs":
+        return importlib.import_module("smtenv.envs")
+
+    if name not in _exports:
+        raise AttributeError("module 'smtenv' has no attribute {0!r}".format(name))
+
+    value = getattr(importlib.import_module(_exports[name]), name)
+    globals()[name] = value
+
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports) | {"envs"})
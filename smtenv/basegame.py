@@ -3,9 +3,23 @@
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 
-import pygame, math, sys, random
+import math, sys, random
 import numpy as np
-from pygame.constants import KEYUP, KEYDOWN, K_F15
+from smtenv.keys import QUIT, KEYUP, KEYDOWN, K_F15
+
+# pygame is only imported once a game opens a window, draws or posts events, and then only its
+# display subsystem (which carries the event queue) is initialized, never audio or joysticks
+def _init_display():
+    import pygame
+
+    if not pygame.display.get_init():
+        pygame.display.init()
+
+    return pygame
+
+def _display_initialized():
+    pygame = sys.modules.get("pygame")
+    return pygame is not None and pygame.display.get_init()
 
 class BaseGame:
     def __init__(self, width, height, actions, rng_seed=None, config=None):
@@ -20,30 +34,130 @@ class BaseGame:
         self.score = 0.0
         self.screen = None
         self.clock = None
-        self.rng = np.random.RandomState(seed=None)
+        # Offscreen render target, see render_frame
+        self.offscreen = None
+        self.pixels = None
+        # Every random draw of a game comes from self.rng, see seed. Creating a RandomState
+        # is slow, so it only happens once the game actually draws
+        self._rng = None
+        self._rng_seed = rng_seed
         # self.display = display
         self.rwd = 0.0
+        self.display = False
 
         self.last_action = None
+        # Action handed to this instance directly (see _set_action), consumed on the next step
+        self.pending_action = None
     
     def setup(self, display=True, rng=None):
-        pygame.init()
         self._setup_display(display)
-        self.clock = pygame.time.Clock()
-        self.rng = rng
+
+        if rng is not None:
+            self.rng = rng
+
+    @property
+    def rng(self):
+        if self._rng is None:
+            self._rng = np.random.RandomState(seed=self._rng_seed)
+        return self._rng
+
+    @rng.setter
+    def rng(self, rng):
+        self._rng = rng
+
+    def seed(self, seed=None):
+        # Restarts the game's generator; the next reset then plays out the same way every time
+        self._rng = None
+        self._rng_seed = seed
     
     def _setup_display(self, display_flag):
         self.display = display_flag
 
+        # Headless games never initialize pygame
         if self.display:
+            pygame = _init_display()
             self.screen = pygame.display.set_mode((self.width, self.height), 0, 32)
+
+            if self.clock is None:
+                self.clock = pygame.time.Clock()
         else:
-            self.screen = None
+            # Headless games draw to the offscreen target, once one exists
+            self.screen = self.offscreen
+
+    def _setup_offscreen(self):
+        # A surface drawing straight into a (height, width, 4) RGBX NumPy array. Unlike a
+        # pygame.surfarray view, the array does not lock the surface, so it can be kept around
+        if self.offscreen is None:
+            import pygame
+
+            self.pixels = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+            self.offscreen = pygame.image.frombuffer(self.pixels, (self.width, self.height), "RGBX")
+
+        if not self.display:
+            self.screen = self.offscreen
+
+    def render_frame(self):
+        # The current frame as a (height, width, 3) RGB view of the offscreen array. Headless
+        # games draw straight into it, a window's frame is copied in
+        self._setup_offscreen()
+
+        if self.display:
+            self._draw()
+            self.offscreen.blit(self.screen, (0, 0))
+        else:
+            self.draw()
+
+        return self.pixels[:, :, :3]
     
     def _handle_player_events(self):
+        if self.pending_action is not None:
+            action, self.pending_action = self.pending_action, None
+
+            self._key_down(action)
+            if self.last_action in self.actions.values():
+                self._key_up(self.last_action)
+
+            # Nothing reads the event queue on this path, only keep the window responsive
+            if self.display:
+                import pygame
+                self._handle_window_events(pygame.event.get())
+            return
+
+        # Without pygame there is no event queue, and so no keys to read
+        if not _display_initialized():
+            return
+
+        import pygame
+        for event in self._handle_window_events(pygame.event.get()):
+            if event.type == KEYDOWN:
+                self._key_down(event.key)
+            elif event.type == KEYUP:
+                self._key_up(event.key)
+
+    def _handle_window_events(self, events):
+        for event in events:
+            if event.type == QUIT:
+                import pygame
+                pygame.quit()
+                sys.exit()
+
+        return events
+
+    def _key_down(self, key):
+        pass
+
+    def _key_up(self, key):
         pass
 
+    def _set_action(self, action):
+        # Per-instance action channel: unlike _do_action, this never touches pygame's
+        # process-global event queue, so several games can be driven in one process
+        self.pending_action = action
+
     def _do_action(self, action):
+        # Posting events needs pygame's event queue even when nothing is displayed
+        pygame = _init_display()
+
         if action not in self.actions.values():
             action = K_F15
         
@@ -58,12 +172,18 @@ class BaseGame:
     
     def _draw(self):
         if self.display:
-            self.draw()
-
-            pygame.display.update()
+            # draw may return the list of rects it changed, only those are pushed then
+            dirty = self.draw()
+
+            import pygame
+            if dirty is None:
+                pygame.display.update()
+            elif dirty:
+                pygame.display.update(dirty)
     
     def tick(self, fps):
-        return self.clock.tick_busy_loop(fps)
+        # Clock.tick sleeps off the rest of the frame, tick_busy_loop would spin a core doing it
+        return self.clock.tick(fps)
 
     def get_screen_dims(self):
         return (self.width, self.height)
@@ -89,6 +209,42 @@ class BaseGame:
     def get_game_state(self):
         raise NotImplementedError("Please override this method")
 
+    # OPTIONAL pair, for array observations: (low, high) bounds whose shape and dtype give the
+    # fixed observation layout, and a method writing the current observation into such an array
+    def get_observation_layout(self):
+        raise NotImplementedError("Please override this method")
+
+    def fill_observation(self, out):
+        raise NotImplementedError("Please override this method")
+
+    # OPTIONAL pair, for planners: an immutable record of all dynamic state of the running game
+    # (cheap to keep many of), and a method putting the game back into a recorded state
+    def get_state_snapshot(self):
+        raise NotImplementedError("Please override this method")
+
+    def restore_state_snapshot(self, snapshot):
+        raise NotImplementedError("Please override this method")
+
+    def _get_rng_state(self):
+        # A generator that was never created has not drawn anything yet, there is no state
+        if self._rng is None:
+            return None
+
+        state = self.rng.get_state()
+        state[1].flags.writeable = False
+
+        return state
+
+    def _set_rng_state(self, state):
+        # Snapshots restore input-free state, actions still queued for the game are dropped
+        self.pending_action = None
+
+        # No state means the generator had not been created yet, so it starts over from its seed
+        if state is None:
+            self._rng = None
+        else:
+            self.rng.set_state(state)
+
     def is_game_over(self):
         raise NotImplementedError("Please override this method")
 
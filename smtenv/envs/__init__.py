@@ -1,2 +1,26 @@
-from smtenv.envs.atesim import ATESim
-from smtenv.envs.avoidgame import AvoidGame
\ No newline at end of file
+import importlib
+
+# Games are imported on first use, see smtenv/__init__.py
+_exports = {
+    "ATESim":            "smtenv.envs.atesim",
+    "AvoidGame":         "smtenv.envs.avoidgame",
+    "AvoidSwarm":        "smtenv.envs.avoidswarm",
+    "VectorATESim":      "smtenv.envs.vecatesim",
+    "ATEModel":          "smtenv.envs.atemodel",
+    "Scenario":          "smtenv.envs.scenario",
+    "register_behavior": "smtenv.envs.behaviors",
+}
+
+__all__ = list(_exports)
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError("module 'smtenv.envs' has no attribute {0!r}".format(name))
+
+    value = getattr(importlib.import_module(_exports[name]), name)
+    globals()[name] = value
+
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
@@ -0,0 +1,236 @@
+import math
+
+import numpy as np
+
+from smtenv.envs.vecatesim import VectorATESim
+from smtenv.envs.scenario import Scenario
+
+class ATEModel:
+    # Exact MDP of an ATESim scenario. Enemies move deterministically, so the dynamics are a
+    # table: next_state[s, a], reward[s, a] and terminal[s, a] (the episode ends with that
+    # transition), for action indices in SMTEnv's order (left, right, up, down, no-op).
+    #
+    # A state is the player cell, every enemy's cell and the phase t % lcm(action rates) of the
+    # enemies' action ticks (all ticks advance together from 0). States are numbered by their
+    # sorted codes; with reachable=True only states reachable from the scenario's start are
+    # kept, otherwise every combination of cells and phases is. Terminal transitions point
+    # next_state back at s, their successor never matters
+    CHUNK = 1 << 16
+
+    def __init__(self, config={}, config_preproccesor = lambda p: p, reachable=True, max_states=10 ** 7):
+        scenario = Scenario.compile(config, config_preproccesor)
+
+        # Transitions are computed by VectorATESim, with random spawns turned off (any cells
+        # do as spawns) so building it neither samples nor touches a generator
+        self.random = scenario.random
+        self.scenario = scenario
+
+        if scenario.random:
+            config = scenario.to_config()
+            config["random"] = False
+            for enemy in config["enemies"]:
+                enemy["x"], enemy["y"] = 0, 0
+
+            self.scenario = Scenario.compile(config)
+
+        self.width = scenario.width
+        self.height = scenario.height
+        self.n_enemies = scenario.n_enemies
+        self.n_actions = VectorATESim.NOOP + 1
+
+        self.action_rate = [int(rate) for rate in scenario.action_rate]
+        self.n_phases = 1
+        for rate in self.action_rate:
+            self.n_phases = self.n_phases * rate // math.gcd(self.n_phases, rate)
+
+        self.n_codes = self.n_phases * (self.width * self.height) ** (1 + self.n_enemies)
+        if self.n_codes > np.iinfo(np.int64).max:
+            raise ValueError("{0} states do not fit in int64 codes".format(self.n_codes))
+
+        if reachable:
+            if self.random:
+                raise Exception("A scenario with random spawns has no single start, use reachable=False")
+
+            self.codes = self._reachable(self.start_code(), max_states)
+        else:
+            if self.n_codes > max_states:
+                raise Exception("Scenario has {0} states, more than max_states={1}".format(self.n_codes, max_states))
+
+            self.codes = np.arange(self.n_codes, dtype=np.int64)
+
+        self.n_states = len(self.codes)
+
+        self.next_state = np.zeros((self.n_states, self.n_actions), dtype=np.int64)
+        self.reward = np.zeros((self.n_states, self.n_actions), dtype=np.float64)
+        self.terminal = np.zeros((self.n_states, self.n_actions), dtype=bool)
+
+        for start in range(0, self.n_states, self.CHUNK):
+            chunk = slice(start, start + self.CHUNK)
+            next_codes, self.reward[chunk], self.terminal[chunk] = self._successors(self.codes[chunk])
+
+            next_states = np.searchsorted(self.codes, next_codes)
+            own = np.arange(chunk.start, chunk.start + len(next_codes))[:, None]
+            self.next_state[chunk] = np.where(self.terminal[chunk], own, next_states)
+
+    def encode(self, phase, player_x, player_y, enemy_x, enemy_y):
+        # Codes of full states given as arrays (enemy_x / enemy_y with one column per enemy)
+        code = np.asarray(phase, dtype=np.int64)
+        code = code * self.height + player_y
+        code = code * self.width + player_x
+
+        enemy_x, enemy_y = np.asarray(enemy_x), np.asarray(enemy_y)
+        for i in range(self.n_enemies):
+            code = code * self.height + enemy_y[..., i]
+            code = code * self.width + enemy_x[..., i]
+
+        return code
+
+    def decode(self, codes):
+        # (phase, player_x, player_y, enemy_x, enemy_y) arrays of an array of codes
+        codes = np.asarray(codes, dtype=np.int64)
+
+        enemy_x = np.zeros(codes.shape + (self.n_enemies,), dtype=np.int64)
+        enemy_y = np.zeros(codes.shape + (self.n_enemies,), dtype=np.int64)
+
+        for i in reversed(range(self.n_enemies)):
+            codes, enemy_x[..., i] = np.divmod(codes, self.width)
+            codes, enemy_y[..., i] = np.divmod(codes, self.height)
+
+        codes, player_x = np.divmod(codes, self.width)
+        phase, player_y = np.divmod(codes, self.height)
+
+        return phase, player_x, player_y, enemy_x, enemy_y
+
+    def start_code(self):
+        if self.random:
+            raise Exception("A scenario with random spawns has no single start")
+
+        scenario = self.scenario
+
+        return int(self.encode(0, scenario.player_x, scenario.player_y, scenario.enemy_x, scenario.enemy_y))
+
+    def start_state(self):
+        return self.index(self.start_code())
+
+    def index(self, codes):
+        # State indices of codes, which must be among the model's states
+        codes = np.asarray(codes, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.codes, codes), self.n_states - 1)
+
+        if np.any(self.codes[idx] != codes):
+            raise Exception("State is not part of the model")
+
+        return idx if idx.ndim else int(idx)
+
+    def state_of(self, game):
+        # State index of a running ATESim game
+        ticks = game.action_tick.tolist()
+        phase = next(p for p in range(self.n_phases) if all(p % rate == tick for rate, tick in zip(self.action_rate, ticks)))
+
+        code = self.encode(phase, game.player.x, game.player.y, game.enemy_x, game.enemy_y)
+
+        return self.index(code)
+
+    def _successors(self, codes):
+        # (next codes, rewards, terminal flags), each (len(codes), n_actions)
+        n = len(codes)
+        phase, player_x, player_y, enemy_x, enemy_y = self.decode(codes)
+        ticks = np.array([phase % rate for rate in self.action_rate], dtype=np.int64).reshape(self.n_enemies, n).T
+
+        next_codes = np.zeros((n, self.n_actions), dtype=np.int64)
+        rewards = np.zeros((n, self.n_actions), dtype=np.float64)
+        dones = np.zeros((n, self.n_actions), dtype=bool)
+
+        vec = VectorATESim(n, self.scenario)
+
+        for a in range(self.n_actions):
+            vec.reset()
+            vec.player_x[:], vec.player_y[:] = player_x, player_y
+            vec.enemy_x[:], vec.enemy_y[:] = enemy_x, enemy_y
+            vec.action_tick[:] = ticks
+
+            rewards[:, a], dones[:, a] = vec.step(np.full(n, a))
+            next_codes[:, a] = self.encode((phase + 1) % self.n_phases, vec.player_x, vec.player_y, vec.enemy_x, vec.enemy_y)
+
+        return next_codes, rewards, dones
+
+    def _reachable(self, start, max_states):
+        # Breadth-first search from the start code, one vectorized frontier at a time
+        seen = np.array([start], dtype=np.int64)
+        frontier = seen
+
+        while len(frontier):
+            found = []
+            for i in range(0, len(frontier), self.CHUNK):
+                next_codes, _, dones = self._successors(frontier[i:i + self.CHUNK])
+                found.append(next_codes[~dones])
+
+            frontier = np.setdiff1d(np.concatenate(found), seen)
+            seen = np.union1d(seen, frontier)
+
+            if len(seen) > max_states:
+                raise Exception("More than max_states={0} states are reachable".format(max_states))
+
+        return seen
+
+def q_values(model, values, gamma):
+    # Q[s, a] of a state value vector
+    return model.reward + gamma * np.where(model.terminal, 0.0, values[model.next_state])
+
+def value_iteration(model, gamma=0.99, tol=1e-6, max_iter=100000):
+    # Optimal state values and a greedy policy (action index per state)
+    values = np.zeros(model.n_states)
+
+    for _ in range(max_iter):
+        q = q_values(model, values, gamma)
+        new_values = q.max(axis=1)
+
+        delta = np.max(np.abs(new_values - values)) if model.n_states else 0.0
+        values = new_values
+
+        if delta <= tol:
+            break
+
+    return values, q_values(model, values, gamma).argmax(axis=1)
+
+def policy_evaluation(model, policy, gamma=0.99, tol=1e-6, max_iter=100000, values=None):
+    # State values of following policy, by iterating its (deterministic) Bellman equation
+    states = np.arange(model.n_states)
+
+    reward = model.reward[states, policy]
+    next_state = model.next_state[states, policy]
+    discount = np.where(model.terminal[states, policy], 0.0, gamma)
+
+    values = np.zeros(model.n_states) if values is None else values.copy()
+
+    for _ in range(max_iter):
+        new_values = reward + discount * values[next_state]
+
+        delta = np.max(np.abs(new_values - values)) if model.n_states else 0.0
+        values = new_values
+
+        if delta <= tol:
+            break
+
+    return values
+
+def policy_iteration(model, gamma=0.99, tol=1e-6, max_iter=1000):
+    # Optimal state values and policy; the policy only changes where an action is strictly better
+    policy = np.full(model.n_states, VectorATESim.NOOP, dtype=np.int64)
+    values = None
+
+    for _ in range(max_iter):
+        values = policy_evaluation(model, policy, gamma, tol, values=values)
+
+        q = q_values(model, values, gamma)
+        best = q.argmax(axis=1)
+
+        current = q[np.arange(model.n_states), policy]
+        improve = q[np.arange(model.n_states), best] > current + tol * (1 + np.abs(current))
+
+        if not improve.any():
+            break
+
+        policy = np.where(improve, best, policy)
+
+    return values, policy
@@ -3,52 +3,25 @@
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 
-import pygame, math, sys, random, json, random
+import math, sys, random, json, random
 
 import numpy as np
+from collections import namedtuple
 
-import pygame.constants
+# pygame is imported by the drawing code only, so headless games never load it
+from smtenv import keys
 from smtenv.basegame import BaseGame
+from smtenv.envs.scenario import Scenario
+from smtenv.envs.occupancy import OccupancyIndex, SortedOccupancyIndex
 
 # from gym.spaces import Box, Dict
 
-#TODO: Change these to 'policies': takes state, returns action
-def chase(self, px, py):
-    disty = self.y - py
-    distx = self.x - px
+# Enemy behaviors live in a registry, see smtenv.envs.behaviors; behaviors maps the names to
+# their per-enemy functions, as it always has, and adding one registers it
+from smtenv.envs import behaviors as registry
+from smtenv.envs.behaviors import Position, chase, ymirror, xmirror, register_behavior
 
-    if abs(distx) > abs(disty):
-        if distx < 0:
-            return Entity.RIGHT
-        else:
-            return Entity.LEFT
-    else:
-        if disty < 0:
-            return Entity.DOWN
-        else:
-            return Entity.UP
-
-def ymirror(self, px, py):
-    if self.y < py:
-        return Entity.DOWN
-    elif self.y > py:
-        return Entity.UP
-    else:
-        return Entity.NONE
-
-def xmirror(self, px, py):
-    if self.x < px:
-        return Entity.RIGHT
-    elif self.x > px:
-        return Entity.LEFT
-    else:
-        return Entity.NONE
-
-behaviors = {
-    "chase": chase,
-    "ymirror": ymirror,
-    "xmirror": xmirror
-}
+behaviors = registry.BehaviorTable()
 
 def unitvec(x, y): 
     mag = math.sqrt(x * x + y * y)
@@ -64,10 +37,157 @@ def rescale(x, y, scale):
 def clamp(x, mini, maxi):
     return max(min(x, maxi), mini)
 
+class SpawnSampler:
+    # Draws distinct random enemy cells at least min_dist (Manhattan) away from the player
+    # spawn. The eligible region is worked out once per scenario, after that each draw costs
+    # O(k): rejection sampling while most of the grid is eligible, otherwise a partial shuffle
+    # of a cached array of eligible cells (undone afterwards, so draws only depend on the rng)
+    def __init__(self, width, height, px, py, min_dist):
+        self.width = width
+        self.height = height
+        self.px = px
+        self.py = py
+        self.min_dist = min_dist
+
+        # Cells of the grid that fall inside the excluded diamond around the player
+        excluded = 0
+        r = min_dist - 1
+        for x in range(max(0, px - r), min(width - 1, px + r) + 1):
+            ry = r - abs(x - px)
+            excluded += max(0, min(height - 1, py + ry) - max(0, py - ry) + 1)
+
+        self.n_cells = width * height
+        self.n_eligible = self.n_cells - excluded
+
+        self._cells = None
+
+    def _eligible_cells(self):
+        if self._cells is None:
+            cells = np.arange(self.n_cells, dtype=np.int64)
+            dist = np.abs(cells % self.width - self.px) + np.abs(cells // self.width - self.py)
+
+            self._cells = cells[dist >= self.min_dist]
+
+        return self._cells
+
+    def sample(self, k, rng=np.random):
+        # k distinct (x, y) cells; rng only needs a random() method
+        if k > self.n_eligible:
+            raise ValueError("Cannot place {0} enemies on {1} eligible cells".format(k, self.n_eligible))
+
+        if 2 * self.n_eligible >= self.n_cells and 2 * k <= self.n_eligible:
+            taken = set()
+            spawns = []
+
+            while len(spawns) < k:
+                cell = int(self.n_cells * rng.random())
+                x, y = cell % self.width, cell // self.width
+
+                if cell not in taken and abs(x - self.px) + abs(y - self.py) >= self.min_dist:
+                    taken.add(cell)
+                    spawns.append((x, y))
+
+            return spawns
+
+        cells = self._eligible_cells()
+        m = len(cells)
+
+        swaps = []
+        for i in range(k):
+            j = i + int((m - i) * rng.random())
+            cells[i], cells[j] = cells[j], cells[i]
+            swaps.append(j)
+
+        spawns = [(int(cell) % self.width, int(cell) // self.width) for cell in cells[:k]]
+
+        for i in reversed(range(k)):
+            j = swaps[i]
+            cells[i], cells[j] = cells[j], cells[i]
+
+        return spawns
+
+class StateEncoder:
+    # Perfect hash of ATESim observations onto range(n_states), for flat tabular learners. A
+    # state is the player cell plus, for every enemy in scenario order, one of its possible
+    # offsets from the player (those within vision) or "not visible" (slot 0, with vision only)
+    def __init__(self, width, height, vision, enemy_ids):
+        self.width = width
+        self.height = height
+        self.vision = vision
+        self.enemy_ids = list(enemy_ids)
+
+        self.enemy_index = dict((eid, i) for i, eid in enumerate(self.enemy_ids))
+
+        # offsets[slot] is the (dx, dy) an enemy slot stands for, as reported by get_game_state
+        self.offsets = [] if vision is None else [None]
+
+        # slot_table[dx + width - 1][dy + height - 1] is the slot of an offset (-1 if unseeable)
+        self.slot_table = [[-1] * (2 * height - 1) for _ in range(2 * width - 1)]
+
+        for dx in range(-(width - 1), width):
+            for dy in range(-(height - 1), height):
+                if vision is None or abs(dx) + abs(dy) <= vision:
+                    self.slot_table[dx + width - 1][dy + height - 1] = len(self.offsets)
+                    self.offsets.append((dx, dy))
+
+        self.n_slots = len(self.offsets)
+        self.n_states = width * height * self.n_slots ** len(self.enemy_ids)
+
+        self._slot_array = np.array(self.slot_table, dtype=np.int64)
+
+    def encode(self, state):
+        # Code of a get_game_state dict
+        slots = [0] * len(self.enemy_ids)
+
+        for eid, dx, dy in state["enemies"]:
+            slots[self.enemy_index[eid]] = self.slot_table[dx + self.width - 1][dy + self.height - 1]
+
+        code = state["player_y"] * self.width + state["player_x"]
+        for slot in slots:
+            code = code * self.n_slots + slot
+
+        return code
+
+    def decode(self, code):
+        # The get_game_state dict a code stands for
+        slots = []
+        for _ in self.enemy_ids:
+            code, slot = divmod(code, self.n_slots)
+            slots.append(slot)
+        slots.reverse()
+
+        py, px = divmod(code, self.width)
+
+        return {
+            "player_x":     px,
+            "player_y":     py,
+            "enemies":      [(eid, ) + self.offsets[slot] for eid, slot in zip(self.enemy_ids, slots) if self.offsets[slot] is not None]
+        }
+
+    def encode_observations(self, obs):
+        # Codes of array observations (see ATESim.fill_observation), one per row of obs
+        if self.n_states > np.iinfo(np.int64).max:
+            raise ValueError("{0} states do not fit in int64 codes".format(self.n_states))
+
+        obs = np.asarray(obs, dtype=np.int64)
+        single = obs.ndim == 1
+        obs = np.atleast_2d(obs)
+
+        codes = obs[:, 1] * self.width + obs[:, 0]
+
+        for i in range(len(self.enemy_ids)):
+            visible, dx, dy = obs[:, 2 + 3 * i], obs[:, 3 + 3 * i], obs[:, 4 + 3 * i]
+            slot = self._slot_array[dx + self.width - 1, dy + self.height - 1]
+
+            codes = codes * self.n_slots + np.where(visible != 0, slot, 0)
+
+        return codes[0] if single else codes
+
 def draw_cell(x, y, screen, color, cellsize):
     screen_x = x * (cellsize + 1) + 1
     screen_y = y * (cellsize + 1) + 1
 
+    import pygame
     pygame.draw.rect(
         screen,
         color, 
@@ -75,16 +195,67 @@ def draw_cell(x, y, screen, color, cellsize):
         0
     )
 
-class Entity(pygame.sprite.Sprite):
-    NONE, UP, DOWN, LEFT, RIGHT = 0, 1, 2, 3, 4
+# Entity images are only built once something is drawn, and shared by every entity of the
+# same color and size, so headless games never touch pygame
+_cell_images = {}
 
-    def __init__(self, x, y, cellsize, width, height):
-        pygame.sprite.Sprite.__init__(self)
+def cell_image(color, cellsize):
+    key = (color, cellsize)
+
+    if key not in _cell_images:
+        import pygame
 
         image = pygame.surface.Surface((cellsize, cellsize))
         image.fill((0, 0, 0, 0))
         image.set_colorkey((0, 0, 0))
 
+        pygame.draw.rect(
+            image,
+            color,
+            pygame.Rect(0, 0, cellsize, cellsize),
+            0
+        )
+
+        _cell_images[key] = image
+
+    return _cell_images[key]
+
+_vision_overlays = {}
+
+def vision_overlay(radius, color, cellsize):
+    # The cells of a vision diamond (without its center) on a transparent square, cached per
+    # radius; its top left corner goes radius cells up and left of the center cell's corner
+    key = (radius, color, cellsize)
+
+    if key not in _vision_overlays:
+        import pygame
+
+        size = (2 * radius + 1) * (cellsize + 1)
+        overlay = pygame.surface.Surface((size, size))
+        overlay.fill((0, 0, 0))
+        overlay.set_colorkey((0, 0, 0))
+
+        for i in range(radius + 1):
+            for j in range(radius + 1 - i):
+                if i != 0 or j != 0:
+                    draw_cell(radius + i, radius + j, overlay, color, cellsize)
+                    draw_cell(radius + i, radius - j, overlay, color, cellsize)
+
+                    draw_cell(radius - i, radius + j, overlay, color, cellsize)
+                    draw_cell(radius - i, radius - j, overlay, color, cellsize)
+
+        _vision_overlays[key] = overlay
+
+    return _vision_overlays[key]
+
+class Entity:
+    NONE, UP, DOWN, LEFT, RIGHT = registry.NONE, registry.UP, registry.DOWN, registry.LEFT, registry.RIGHT
+
+    COLOR = (0, 0, 0)
+
+    __slots__ = ("x", "y", "width", "height", "cellsize", "dir")
+
+    def __init__(self, x, y, cellsize, width, height):
         self.x = x
         self.y = y
 
@@ -93,10 +264,12 @@ class Entity(pygame.sprite.Sprite):
 
         self.cellsize = cellsize
 
-        self.image = image
-
         self.dir = Entity.NONE
 
+    @property
+    def image(self):
+        return cell_image(self.COLOR, self.cellsize)
+
     def update(self, dt):
         if self.dir == Entity.NONE:
             pass
@@ -117,63 +290,84 @@ class Entity(pygame.sprite.Sprite):
     def dist(self, poix, poiy):
         return abs(self.x - poix) + abs(self.y - poiy)
     
-    def diamond(self, radius, color, screen):
-        for i in range(radius + 1):
-            for j in range(radius + 1 - i):
-                if i != 0 or j != 0: 
-                    draw_cell(self.x + i, self.y + j, screen, color, self.cellsize)
-                    draw_cell(self.x + i, self.y - j, screen, color, self.cellsize)
-
-                    draw_cell(self.x - i, self.y + j, screen, color, self.cellsize)
-                    draw_cell(self.x - i, self.y - j, screen, color, self.cellsize)
-    
     def draw(self, screen):
         # draw_cell(self.x, self.y, )
         screen.blit(self.image, self.to_screen_xy())
 
 class Player(Entity):
+    COLOR = (0, 255, 0)
+
+    __slots__ = ("vision",)
+
     def __init__(self, x, y, cellsize, width, height, vision=None):
         super(Player, self).__init__(x, y, cellsize, width, height)
 
-        pygame.draw.rect(
-            self.image, 
-            (0, 255, 0), 
-            pygame.Rect(0, 0, cellsize, cellsize),
-            0
-        )
-
         self.vision = vision
     
     def update(self, dt):
         super(Player, self).update(dt)
 
+# Cell offsets of a move in each direction (NONE, UP, DOWN, LEFT, RIGHT)
+_dir_dx = np.array([0, 0, 0, -1, 1], dtype=np.int64)
+_dir_dy = np.array([0, -1, 1, 0, 0], dtype=np.int64)
+
+def _enemy_column(name):
+    # Property reading and writing an enemy's row of one of its game's enemy arrays
+    def get(self):
+        return int(getattr(self.game, name)[self.index])
+
+    def set(self, value):
+        getattr(self.game, name)[self.index] = value
+
+    return property(get, set)
+
+def _enemy_position(name):
+    # _enemy_column for x and y, which also moves the enemy in its game's occupancy index
+    def get(self):
+        return int(getattr(self.game, name)[self.index])
+
+    def set(self, value):
+        game, i = self.game, self.index
+
+        old = int(game.enemy_y[i]) * self.width + int(game.enemy_x[i])
+        getattr(game, name)[i] = value
+        game.occupancy.move(i, old, int(game.enemy_y[i]) * self.width + int(game.enemy_x[i]))
+
+    return property(get, set)
+
 class Enemy(Entity):
-    def __init__(self, x, y, cellsize, width, height, id=None, behavior=lambda self, *x: self.dir, action_rate=1):
-        super(Enemy, self).__init__(x, y, cellsize, width, height)
+    # An enemy of an ATESim game. Its position, direction and action tick are its row of the
+    # game's enemy arrays, which ATESim.step moves all at once
+    COLOR = (255, 0, 0)
+
+    __slots__ = ("game", "index", "behavior", "action_rate", "id")
+
+    x = _enemy_position("enemy_x")
+    y = _enemy_position("enemy_y")
+    dir = _enemy_column("enemy_dir")
+    action_tick = _enemy_column("action_tick")
+
+    def __init__(self, game, index, cellsize, width, height, id=None, behavior=None, action_rate=1):
+        self.game = game
+        self.index = index
+
+        self.width = width
+        self.height = height
+
+        self.cellsize = cellsize
 
         self.behavior = behavior
         self.action_rate = action_rate
-        self.action_tick = 0
 
         self.id = id
 
-        pygame.draw.rect(
-            self.image, 
-            (255, 0, 0), 
-            pygame.Rect(0, 0, cellsize, cellsize),
-            0
-        )
-        
-    def update(self, dt, px, py):
-        self.action_tick += 1
-
-        if self.action_tick == self.action_rate:
-            self.dir = self.behavior(self, px, py)
-            self.action_tick = 0
-        
-        super(Enemy, self).update(dt)
+# Dynamic state of an ATESim game: player (x, y, dir), and (x, y, dir, action_tick) per enemy
+ATESimSnapshot = namedtuple("ATESimSnapshot", ["player", "enemies", "score", "rwd", "lives", "timestep", "rng"])
 
 class ATESim(BaseGame):
+    # Scenarios with at least this many enemies move them with the behaviors' array kernels
+    KERNEL_MIN_ENEMIES = 48
+
     @staticmethod
     def path_preprocessor(config_path):
         with open(config_path) as json_file:
@@ -190,15 +384,22 @@ class ATESim(BaseGame):
         # return np.asarray(ls, dtype=float)
         return tuple(ls)
     
+    @staticmethod
+    def state_encoder(config={}, config_preproccesor = lambda p: p):
+        # StateEncoder for a scenario, e.g. to use encoder.encode as the state_preprocessor
+        scenario = Scenario.compile(config, config_preproccesor)
+        return StateEncoder(scenario.width, scenario.height, scenario.vision, scenario.enemy_ids)
+
     @staticmethod
     def launch(scenario_path):
-        pygame.init()
+        import pygame
+
         game = ATESim(scenario_path, ATESim.path_preprocessor)
         game.setup(display=True)
         game.init()
 
         while True:
-            dt = game.clock.tick_busy_loop(30)
+            dt = game.tick(30)
             if game.is_game_over():
                 game.reset()
 
@@ -206,42 +407,62 @@ class ATESim(BaseGame):
             game.draw()
             pygame.display.update()
     
-    # REQUIRED method
-    def __init__(self, config={}, config_preproccesor = lambda p: p):
+    # REQUIRED method. config is a scenario dict, a Scenario, or anything config_preproccesor
+    # turns into one; scenarios are compiled once and shared by every instance (see Scenario)
+    def __init__(self, config={}, config_preproccesor = lambda p: p, rng_seed=None):
 
         # Actions the player agent in the simulation can take
         actions = {
-            "left": pygame.constants.K_LEFT,
-            "right": pygame.constants.K_RIGHT,
-            "up": pygame.constants.K_UP,
-            "down": pygame.constants.K_DOWN
+            "left": keys.K_LEFT,
+            "right": keys.K_RIGHT,
+            "up": keys.K_UP,
+            "down": keys.K_DOWN
         }
 
-        config = config_preproccesor(config)
+        self.scenario = scenario = Scenario.compile(config, config_preproccesor)
 
         self.timestep = 0
 
-        width, height = config["width"] * (config["cellsize"] + 1), config["height"] * (config["cellsize"] + 1)
+        width, height = scenario.width * (scenario.cellsize + 1), scenario.height * (scenario.cellsize + 1)
 
         # Run the initialization on the base class
-        BaseGame.__init__(self, width, height, actions=actions, config=config)
+        BaseGame.__init__(self, width, height, actions=actions, rng_seed=rng_seed, config=scenario.to_config())
+
+        self.spawn_sampler = scenario.spawn_sampler
+
+        # Enemies by cell, for collision and vision queries, in the form suiting how step moves them
+        if scenario.n_enemies >= self.KERNEL_MIN_ENEMIES:
+            self.occupancy = SortedOccupancyIndex(scenario.width, scenario.height)
+        else:
+            self.occupancy = OccupancyIndex(scenario.width, scenario.height)
+
+        # Views of the enemy arrays init sets up, one per enemy
+        self.enemies = [
+            Enemy(
+                self, i,
+                scenario.cellsize,
+                scenario.width, scenario.height,
+                id=enemy.id,
+                behavior=enemy.behavior,
+                action_rate=enemy.action_rate
+            )
+            for i, enemy in enumerate(scenario.enemies)
+        ]
+
+        # Drawing state: grid background, and what the last frame put on which screen
+        self.background = None
+        self.last_frame = None
+        self.last_frame_screen = None
     
-    def _handle_player_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                key = event.key
-                
-                if key == self.actions["left"]:
-                    self.player.dir = Entity.LEFT
-                elif key == self.actions["right"]:
-                    self.player.dir = Entity.RIGHT
-                elif key == self.actions["up"]:
-                    self.player.dir = Entity.UP
-                elif key == self.actions["down"]:
-                    self.player.dir = Entity.DOWN
+    def _key_down(self, key):
+        if key == self.actions["left"]:
+            self.player.dir = Entity.LEFT
+        elif key == self.actions["right"]:
+            self.player.dir = Entity.RIGHT
+        elif key == self.actions["up"]:
+            self.player.dir = Entity.UP
+        elif key == self.actions["down"]:
+            self.player.dir = Entity.DOWN
 
     # REQUIRED method
     def init(self):
@@ -252,55 +473,31 @@ class ATESim(BaseGame):
 
         # Simulation specific initialization (include here stuff for intializing a new game
         # in this class, since a class instance can run its game multiple times)
+        scenario = self.scenario
+
         self.player = Player(
-            self.config['player']['x'], 
-            self.config['player']['y'], 
-            self.config['cellsize'], 
-            self.config['width'], self.config['height'],
-            self.config["player"].get("vision") or None
+            scenario.player_x,
+            scenario.player_y,
+            scenario.cellsize,
+            scenario.width, scenario.height,
+            scenario.vision
         )
 
-        self.enemies = []
+        # Enemy state, one row per enemy in scenario order
+        n = scenario.n_enemies
 
-        pt_set = set()
-        if self.config.get('random'):
-            min_dist = self.config.get('mind_dist') or 1
-
-            for x in range(self.config['width']):
-                for y in range(self.config['height']):
-                    if self.player.dist(x, y) >= min_dist:
-                        pt_set.add((x, y))
-
-            for enemy in self.config['enemies']:
-                loc = random.sample(pt_set, 1)[0]
-                pt_set.remove(loc)
+        if scenario.random:
+            spawns = self.spawn_sampler.sample(n, self.rng)
+            self.enemy_x, self.enemy_y = np.array(spawns, dtype=np.int64).reshape(n, 2).T.copy()
+        else:
+            self.enemy_x = scenario.enemy_x.copy()
+            self.enemy_y = scenario.enemy_y.copy()
 
-                e = Enemy(
-                    loc[0],
-                    loc[1],
-                    self.config['cellsize'],
-                    self.config['width'], self.config['height'],
-                    id=enemy['id'],
-                    behavior=behaviors[enemy['behavior']],
-                    action_rate=enemy['action_rate']
-                )
+        self.enemy_dir = np.zeros(n, dtype=np.int64)
+        self.action_tick = np.zeros(n, dtype=np.int64)
 
-                self.enemies.append(e)
+        self.occupancy.rebuild(self.enemy_x, self.enemy_y)
 
-        else:
-            for enemy in self.config['enemies']:
-                e = Enemy(
-                    enemy['x'],
-                    enemy['y'],
-                    self.config['cellsize'],
-                    self.config['width'], self.config['height'],
-                    id=enemy['id'],
-                    behavior=behaviors[enemy['behavior']],
-                    action_rate=enemy['action_rate']
-                )
-
-                self.enemies.append(e)
-                
         self.lives = 1
     
     # REQUIRED method
@@ -312,9 +509,6 @@ class ATESim(BaseGame):
         # Simulation specific game over condition
         return self.lives == 0
     
-    def _dist(self, e):
-        return abs(self.player.x - e.x) + abs(self.player.y - e.y)
-
     # REQUIRED method -- body of game itself
     def step(self, dt):
         # Adjust score
@@ -327,67 +521,226 @@ class ATESim(BaseGame):
         self._handle_player_events()
         self.player.update(dt)
 
-        sum_dist = 0.0
+        if self.enemies:
+            px, py = self.player.x, self.player.y
 
-        for e in self.enemies:
-            e.update(dt, self.player.x, self.player.y)
+            if len(self.enemies) >= self.KERNEL_MIN_ENEMIES:
+                self._update_enemies(px, py)
 
-            dist = self._dist(e)
-            sum_dist += dist
+                dist = np.abs(self.enemy_x - px) + np.abs(self.enemy_y - py)
+                last, total = int(dist[-1]), int(dist.sum())
+            else:
+                last, total = self._update_each_enemy(px, py)
 
-            if dist == 0:
-                self.lives = 0
+            hits = self.occupancy.count(px, py)
+
+            # The last enemy decides between the collision penalty and the squared total distance
+            if last == 0:
                 self.rwd = -1000
             else:
-                self.rwd = sum_dist ** 2
-                self.timestep += 1
+                self.rwd = float(total) ** 2
+
+            if hits:
+                self.lives = 0
+            self.timestep += len(self.enemies) - hits
         # self.rwd = -sum_dist
         self.score += self.rwd
-    
+
+    def _update_enemies(self, px, py):
+        # Every enemy whose action tick comes up picks a direction, one kernel call per behavior,
+        # then all enemies move a cell in their direction and stop
+        tick, dirs = self.action_tick, self.enemy_dir
+
+        tick += 1
+        fire = tick == self.scenario.action_rate
+
+        if np.count_nonzero(fire):
+            for name, kernel, idx in self.scenario.behavior_groups:
+                idx = idx[fire[idx]]
+
+                if not len(idx):
+                    continue
+
+                if name in registry.function_only:
+                    dirs[idx] = [self.scenario.enemies[i].behavior(self.enemies[i], px, py) for i in idx.tolist()]
+                else:
+                    dirs[idx] = kernel(self.enemy_x[idx], self.enemy_y[idx], px, py)
+
+            tick[fire] = 0
+
+        moving = np.flatnonzero(dirs)
+
+        if len(moving):
+            d = dirs[moving]
+            width = self.scenario.width
+
+            x = np.minimum(np.maximum(self.enemy_x[moving] + _dir_dx[d], 0), width - 1)
+            y = np.minimum(np.maximum(self.enemy_y[moving] + _dir_dy[d], 0), self.scenario.height - 1)
+
+            old = self.enemy_y[moving] * width + self.enemy_x[moving]
+            new = y * width + x
+
+            self.enemy_x[moving], self.enemy_y[moving] = x, y
+            dirs[moving] = Entity.NONE
+
+            moved = old != new
+            self.occupancy.move_many(moving[moved], old[moved], new[moved])
+
+    def _update_each_enemy(self, px, py):
+        # _update_enemies one enemy at a time with the per-enemy behavior functions, cheaper
+        # than array calls for a handful of enemies. Returns the last enemy's distance to the
+        # player and the sum of distances
+        width, height = self.scenario.width, self.scenario.height
+        occupancy = self.occupancy
+
+        enemies, function_only = self.enemies, registry.function_only
+        x, y, dirs, tick = self.enemy_x, self.enemy_y, self.enemy_dir, self.action_tick
+        xs, ys, ds, ts = x.tolist(), y.tolist(), dirs.tolist(), tick.tolist()
+
+        dist = total = 0
+
+        for i, enemy in enumerate(self.scenario.enemies):
+            ex, ey, d, t = xs[i], ys[i], ds[i], ts[i] + 1
+
+            if t == enemy.action_rate:
+                if enemy.behavior_name in function_only:
+                    # Behaviors see the enemy with the tick that fired, as Enemy.update always did
+                    tick[i] = t
+                    d = enemy.behavior(enemies[i], px, py)
+                else:
+                    # Behaviors with a kernel only depend on the position
+                    d = enemy.behavior(Position(ex, ey), px, py)
+
+                t = 0
+
+            tick[i] = t
+
+            if d != Entity.NONE:
+                if d == Entity.UP and ey > 0:
+                    ey -= 1
+                elif d == Entity.DOWN and ey < height - 1:
+                    ey += 1
+                elif d == Entity.LEFT and ex > 0:
+                    ex -= 1
+                elif d == Entity.RIGHT and ex < width - 1:
+                    ex += 1
+
+                x[i], y[i], dirs[i] = ex, ey, Entity.NONE
+                occupancy.move(i, ys[i] * width + xs[i], ey * width + ex)
+
+            dist = abs(ex - px) + abs(ey - py)
+            total += dist
+
+        return dist, total
+
+    def _render_background(self):
+        # Empty grid, drawn once per game
+        import pygame
+
+        background = pygame.surface.Surface((self.width, self.height))
+        background.fill((0, 0, 0))
+
+        step = self.config["cellsize"] + 1
+
+        for vert in range(self.config["width"]):
+            pygame.draw.line(background, (255, 255, 255), (vert * step, 0), (vert * step, self.height))
+        pygame.draw.line(background, (255, 255, 255), (self.width - 1, 0), (self.width - 1, self.height))
+
+        for horz in range(self.config["height"]):
+            pygame.draw.line(background, (255, 255, 255), (0, horz * step), (self.width, horz * step))
+        pygame.draw.line(background, (255, 255, 255), (0, self.height - 1), (self.width, self.height - 1))
+
+        if pygame.display.get_surface() is not None:
+            background = background.convert()
+
+        return background
+
+    def _frame(self):
+        # Everything drawn on top of the background, in drawing order, as (image, rect)
+        import pygame
+
+        cellsize = self.config["cellsize"]
+
+        items = [(self.player.image, pygame.Rect(self.player.to_screen_xy(), (cellsize, cellsize)))]
+
+        if self.player.vision:
+            overlay = vision_overlay(self.player.vision, (0, 100, 0), cellsize)
+            corner = ((self.player.x - self.player.vision) * (cellsize + 1), (self.player.y - self.player.vision) * (cellsize + 1))
+
+            items.append((overlay, overlay.get_rect(topleft=corner)))
+
+        image = cell_image(Enemy.COLOR, cellsize)
+        for x, y in zip(self.enemy_x.tolist(), self.enemy_y.tolist()):
+            items.append((image, pygame.Rect((x * (cellsize + 1) + 1, y * (cellsize + 1) + 1), (cellsize, cellsize))))
+
+        return items
+
+    def _setup_display(self, display_flag):
+        # A reopened window may be the same Surface (pygame 2 hands it back from set_mode) with
+        # other contents, so the next frame is always drawn in full
+        BaseGame._setup_display(self, display_flag)
+        self.last_frame = None
+
     def draw(self):
-        self.screen.fill((0, 0, 0))
+        # Redraws only what changed since the last frame on this screen, and returns the dirty
+        # rects (None after a full redraw) for BaseGame._draw to push to the display
+        items = self._frame()
 
-        for vert in range(self.width):
-            x = vert * (self.config["cellsize"] + 1)
+        if self.background is None:
+            self.background = self._render_background()
 
-            pygame.draw.line(
-                self.screen,
-                (255, 255, 255),
-                (x, 0),
-                (x, self.height)
-            )
-        
-        pygame.draw.line(
-            self.screen,
-            (255, 255, 255),
-            (self.width - 1, 0),
-            (self.width - 1, self.height)
-        )
-        
-        for horz in range(self.height):
-            y = horz * (self.config["cellsize"] + 1)
-
-            pygame.draw.line(
-                self.screen,
-                (255, 255, 255),
-                (0, y),
-                (self.width, y)
-            )
-        
-        pygame.draw.line(
-            self.screen,
-            (255, 255, 255),
-            (0, self.height - 1),
-            (self.width, self.height - 1)
+        last = self.last_frame if self.last_frame_screen is self.screen else None
+
+        self.last_frame = items
+        self.last_frame_screen = self.screen
+
+        if last is None or len(last) != len(items):
+            self.screen.blit(self.background, (0, 0))
+
+            for image, rect in items:
+                self.screen.blit(image, rect)
+
+            return None
+
+        dirty = []
+        for old, new in zip(last, items):
+            if old != new:
+                dirty.append(old[1])
+                dirty.append(new[1])
+
+        rects = [rect for _, rect in items]
+
+        for area in dirty:
+            self.screen.set_clip(area)
+            self.screen.blit(self.background, area, area)
+
+            for i in area.collidelistall(rects):
+                self.screen.blit(items[i][0], rects[i])
+
+        self.screen.set_clip(None)
+
+        return dirty
+
+    def get_state_snapshot(self):
+        return ATESimSnapshot(
+            (self.player.x, self.player.y, self.player.dir),
+            tuple(zip(self.enemy_x.tolist(), self.enemy_y.tolist(), self.enemy_dir.tolist(), self.action_tick.tolist())),
+            self.score, self.rwd, self.lives, self.timestep, self._get_rng_state()
         )
 
-        self.player.draw(self.screen)
+    def restore_state_snapshot(self, snapshot):
+        if len(snapshot.enemies) != len(self.enemies):
+            raise Exception("Snapshot has {0} enemies, the game has {1}".format(len(snapshot.enemies), len(self.enemies)))
 
-        if self.player.vision:
-            self.player.diamond(self.player.vision, (0, 100, 0), self.screen)
+        self.player.x, self.player.y, self.player.dir = snapshot.player
 
-        for e in self.enemies:
-            e.draw(self.screen)
+        for i, (x, y, d, tick) in enumerate(snapshot.enemies):
+            self.enemy_x[i], self.enemy_y[i], self.enemy_dir[i], self.action_tick[i] = x, y, d, tick
+
+        self.occupancy.rebuild(self.enemy_x, self.enemy_y)
+
+        self.score, self.rwd, self.lives, self.timestep = snapshot.score, snapshot.rwd, snapshot.lives, snapshot.timestep
+        self._set_rng_state(snapshot.rng)
 
     # REQUIRED method (if you want the state space to be not the screen itself, highly 
     # advised for simulation purposes)
@@ -399,11 +752,48 @@ class ATESim(BaseGame):
             "player_y":     self.player.y,
             # "enemy_x":      self.enemy.x,
             # "enemy_y":      self.enemy.y,
-            "enemies":      [(e.id, e.x - self.player.x, self.player.y - e.y) for e in self.enemies if self.player.vision == None or self._dist(e) <= self.player.vision]
+            "enemies":      [
+                (self.scenario.enemy_ids[i], self.enemy_x.item(i) - self.player.x, self.player.y - self.enemy_y.item(i))
+                for i in self._visible()
+            ]
         }
 
         return state
 
+    def _visible(self):
+        # Indices of the enemies inside the player's vision, in scenario order
+        if self.player.vision == None:
+            return range(len(self.enemies))
+
+        return self.occupancy.within(self.player.x, self.player.y, self.player.vision)
+
+    # Array observation: [player_x, player_y] followed by a [visible, dx, dy] slot per enemy in
+    # scenario order, offsets as in get_game_state; enemies outside vision leave a zeroed slot
+    def get_observation_layout(self):
+        w, h = self.config['width'], self.config['height']
+        n = len(self.config['enemies'])
+
+        low = np.array([0, 0] + [0, -(w - 1), -(h - 1)] * n, dtype=np.int64)
+        high = np.array([w - 1, h - 1] + [1, w - 1, h - 1] * n, dtype=np.int64)
+
+        return low, high
+
+    def fill_observation(self, out):
+        px, py = self.player.x, self.player.y
+
+        out[0] = px
+        out[1] = py
+        out[2:] = 0
+
+        for i in self._visible():
+            j = 2 + 3 * i
+
+            out[j] = 1
+            out[j + 1] = self.enemy_x.item(i) - px
+            out[j + 2] = py - self.enemy_y.item(i)
+
+        return out
+
 if __name__ == "__main__":
     import sys
 
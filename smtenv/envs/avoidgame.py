@@ -4,8 +4,11 @@ import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 
 import pygame, math, sys, random
+import numpy as np
+from collections import namedtuple
 
-import pygame.constants
+# Entities are pygame sprites, so unlike ATESim this game imports pygame along with it
+from smtenv import keys
 from smtenv.basegame import BaseGame 
 
 # from gym.spaces import Box, Dict
@@ -116,16 +119,25 @@ class Enemy(Entity):
 
         super(Enemy, self).update(dt)
 
+# Dynamic state of an AvoidGame game, player and enemy as (x, y, vx, vy, ax, ay)
+AvoidGameSnapshot = namedtuple("AvoidGameSnapshot", ["player", "enemy", "score", "lives", "rng"])
+
+def body_state(entity):
+    return (entity.x, entity.y, entity.vx, entity.vy, entity.ax, entity.ay)
+
+def set_body_state(entity, state):
+    entity.x, entity.y, entity.vx, entity.vy, entity.ax, entity.ay = state
+
 class AvoidGame(BaseGame):
     # REQUIRED method
-    def __init__(self, width=200, height=200):
+    def __init__(self, width=200, height=200, rng_seed=None):
 
         # Actions the player agent in the simulation can take
         actions = {
-            "left": pygame.constants.K_LEFT,
-            "right": pygame.constants.K_RIGHT,
-            "up": pygame.constants.K_UP,
-            "down": pygame.constants.K_DOWN
+            "left": keys.K_LEFT,
+            "right": keys.K_RIGHT,
+            "up": keys.K_UP,
+            "down": keys.K_DOWN
         }
 
         # Simulation specific initialization (include here stuff for intializing class itself)
@@ -146,35 +158,27 @@ class AvoidGame(BaseGame):
         }
 
         # Run the initialization on the base class
-        BaseGame.__init__(self, width, height, actions=actions, config=config)
+        BaseGame.__init__(self, width, height, actions=actions, rng_seed=rng_seed, config=config)
     
-    def _handle_player_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                key = event.key
-                
-                if key == self.actions["left"]:
-                    self.player.ax = -self.config['player']['acc']
-                elif key == self.actions["right"]:
-                    self.player.ax = self.config['player']['acc']
-                elif key == self.actions["up"]:
-                    self.player.ay = -self.config['player']['acc']
-                elif key == self.actions["down"]:
-                    self.player.ay = self.config['player']['acc']
-            elif event.type == pygame.KEYUP:
-                key = event.key
-
-                if key == self.actions["left"] and self.player.vx < 0:
-                    self.player.ax = 0
-                elif key == self.actions["right"] and self.player.vx > 0:
-                    self.player.ax = 0
-                elif key == self.actions["up"] and self.player.vy < 0:
-                    self.player.ay = 0
-                elif key == self.actions["down"] and self.player.vy > 0:
-                    self.player.ay = 0
+    def _key_down(self, key):
+        if key == self.actions["left"]:
+            self.player.ax = -self.config['player']['acc']
+        elif key == self.actions["right"]:
+            self.player.ax = self.config['player']['acc']
+        elif key == self.actions["up"]:
+            self.player.ay = -self.config['player']['acc']
+        elif key == self.actions["down"]:
+            self.player.ay = self.config['player']['acc']
+
+    def _key_up(self, key):
+        if key == self.actions["left"] and self.player.vx < 0:
+            self.player.ax = 0
+        elif key == self.actions["right"] and self.player.vx > 0:
+            self.player.ax = 0
+        elif key == self.actions["up"] and self.player.vy < 0:
+            self.player.ay = 0
+        elif key == self.actions["down"] and self.player.vy > 0:
+            self.player.ay = 0
 
     # REQUIRED method
     def init(self):
@@ -189,8 +193,8 @@ class AvoidGame(BaseGame):
             (self.config['width'], self.config['height'])
         )
 
-        x = round((self.config['width'] / 4) * random.random())
-        y = round((self.config['height'] / 4) * random.random())
+        x = round((self.config['width'] / 4) * self.rng.random())
+        y = round((self.config['height'] / 4) * self.rng.random())
 
         self.enemy = Enemy(
             self.config['enemy']['max_speed'], 
@@ -222,8 +226,6 @@ class AvoidGame(BaseGame):
         # setting self.allowed_fps to desried value)
         dt /= 1000
 
-        self.screen.fill((0, 0, 0))
-
         self._handle_player_events()
         self.player.update(dt)
         # self.player.draw(self.screen)
@@ -239,9 +241,21 @@ class AvoidGame(BaseGame):
         self.score += dt * dist
     
     def draw(self):
+        self.screen.fill((0, 0, 0))
+
         self.player.draw(self.screen)
         self.enemy.draw(self.screen)
 
+    def get_state_snapshot(self):
+        return AvoidGameSnapshot(body_state(self.player), body_state(self.enemy), self.score, self.lives, self._get_rng_state())
+
+    def restore_state_snapshot(self, snapshot):
+        set_body_state(self.player, snapshot.player)
+        set_body_state(self.enemy, snapshot.enemy)
+
+        self.score, self.lives = snapshot.score, snapshot.lives
+        self._set_rng_state(snapshot.rng)
+
     # REQUIRED method (if you want the state space to be not the screen itself, highly 
     # advised for simulation purposes)
     def get_game_state(self):
@@ -260,15 +274,35 @@ class AvoidGame(BaseGame):
 
         return state
 
-if __name__ == "__main__":
-    import numpy as np
+    # Array observation: the values of get_game_state, in the same order
+    def get_observation_layout(self):
+        w, h = self.config['width'], self.config['height']
+        ps, es = self.config['player']['max_speed'], self.config['enemy']['max_speed']
+
+        low = np.array([0, 0, -ps, -ps, 0, 0, -es, -es], dtype=np.float64)
+        high = np.array([w, h, ps, ps, w, h, es, es], dtype=np.float64)
 
+        return low, high
+
+    def fill_observation(self, out):
+        out[0] = self.player.x
+        out[1] = self.player.y
+        out[2] = self.player.vx
+        out[3] = self.player.vy
+        out[4] = self.enemy.x
+        out[5] = self.enemy.y
+        out[6] = self.enemy.vx
+        out[7] = self.enemy.vy
+
+        return out
+
+if __name__ == "__main__":
     game = AvoidGame(width=256, height=256)
     game.setup(display=True)
     game.init()
 
     while True:
-        dt = game.clock.tick_busy_loop(30)
+        dt = game.tick(30)
         if game.is_game_over():
             game.reset()
 
@@ -0,0 +1,239 @@
+import os
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+
+import pygame
+
+import numpy as np
+from collections import namedtuple
+
+from smtenv.envs.avoidgame import AvoidGame, Player, body_state, set_body_state
+from smtenv.envs.broadphase import UniformGrid, touching
+
+# Dynamic state of an AvoidSwarm game: player (x, y, vx, vy, ax, ay), and read-only copies of
+# the enemy arrays (x, y, vx, vy)
+AvoidSwarmSnapshot = namedtuple("AvoidSwarmSnapshot", ["player", "enemies", "score", "lives", "rng"])
+
+def frozen(arr):
+    arr = arr.copy()
+    arr.flags.writeable = False
+    return arr
+
+class AvoidSwarm(AvoidGame):
+    # AvoidGame against num_enemies pursuers. Enemy physics (acceleration towards the player,
+    # friction, speed cap, boundary clamping) and the hit test run as array operations over
+    # the whole swarm, following the same rules as avoidgame.Enemy.update. With separation,
+    # overlapping enemies are also pushed apart every step; a uniform grid broad phase picks
+    # the pairs to test, so this stays near-linear in the number of enemies
+    def __init__(self, width=200, height=200, num_enemies=100, rng_seed=None, separation=False):
+        AvoidGame.__init__(self, width, height, rng_seed)
+
+        self.config['num_enemies'] = num_enemies
+        self.config['separation'] = separation
+
+        self.grid = UniformGrid(self.config['enemy']['radius'])
+
+        self.enemy_image = None
+
+    def init(self):
+        self.score = 0
+
+        self.player = Player(
+            self.config['player']['max_speed'],
+            self.config['player']['radius'],
+            self.config['fric'],
+            (self.config['width'], self.config['height'])
+        )
+
+        n = self.config['num_enemies']
+
+        # Same spawn rule as AvoidGame, once per enemy
+        spawns = [
+            (round((self.config['width'] / 4) * self.rng.random()), round((self.config['height'] / 4) * self.rng.random()))
+            for _ in range(n)
+        ]
+
+        self.enemy_x = np.array([x for x, _ in spawns], dtype=float).reshape(n)
+        self.enemy_y = np.array([y for _, y in spawns], dtype=float).reshape(n)
+        self.enemy_vx = np.zeros(n)
+        self.enemy_vy = np.zeros(n)
+
+        self.lives = 1
+
+    def _update_enemies(self, dt, px, py):
+        enemy = self.config['enemy']
+        max_speed, radius, acc, fric = enemy['max_speed'], enemy['radius'], enemy['acc'], self.config['fric']
+        n = len(self.enemy_x)
+
+        # Acceleration towards the player
+        dx, dy = px - self.enemy_x, py - self.enemy_y
+        mag = np.sqrt(dx * dx + dy * dy)
+        moving = mag != 0
+
+        ax = np.divide(dx, mag, out=np.zeros(n), where=moving) * acc
+        ay = np.divide(dy, mag, out=np.zeros(n), where=moving) * acc
+
+        # Friction against the current heading, proportional to speed
+        vx, vy = self.enemy_vx, self.enemy_vy
+        spd = np.sqrt(vx * vx + vy * vy)
+        moving = spd != 0
+        fric_scale = -fric * (spd / max_speed)
+
+        vx += (ax + np.divide(vx, spd, out=np.zeros(n), where=moving) * fric_scale) * dt
+        vy += (ay + np.divide(vy, spd, out=np.zeros(n), where=moving) * fric_scale) * dt
+
+        # Speed cap, and enemies that have nearly stopped are halted
+        spd = np.sqrt(vx * vx + vy * vy)
+        fast = spd > max_speed
+        vx[fast] = vx[fast] / spd[fast] * max_speed
+        vy[fast] = vy[fast] / spd[fast] * max_speed
+
+        slow = spd < 0.5
+        vx[slow] = 0
+        vy[slow] = 0
+
+        self.enemy_x += vx * dt
+        self.enemy_y += vy * dt
+
+        np.clip(self.enemy_x, radius, self.config['width'] - radius, out=self.enemy_x)
+        np.clip(self.enemy_y, radius, self.config['height'] - radius, out=self.enemy_y)
+
+    def _separate_enemies(self):
+        # Moves both enemies of every overlapping pair half the overlap apart, along the line
+        # through their centers (along x for enemies on the same spot)
+        radius = self.config['enemy']['radius']
+        x, y = self.enemy_x, self.enemy_y
+
+        self.grid.build(x, y)
+        i, j = self.grid.pairs()
+
+        hit = touching(x, y, radius, i, j)
+        i, j = i[hit], j[hit]
+
+        if len(i) == 0:
+            return
+
+        dx, dy = x[j] - x[i], y[j] - y[i]
+        dist = np.hypot(dx, dy)
+
+        same = dist == 0
+        dx[same], dist[same] = 1.0, 1.0
+
+        scale = (2 * radius - np.hypot(x[j] - x[i], y[j] - y[i])) / (2 * dist)
+        push_x, push_y = dx * scale, dy * scale
+
+        np.subtract.at(x, i, push_x)
+        np.subtract.at(y, i, push_y)
+        np.add.at(x, j, push_x)
+        np.add.at(y, j, push_y)
+
+        np.clip(x, radius, self.config['width'] - radius, out=x)
+        np.clip(y, radius, self.config['height'] - radius, out=y)
+
+    def step(self, dt):
+        dt /= 1000
+
+        self._handle_player_events()
+        self.player.update(dt)
+
+        self._update_enemies(dt, self.player.x, self.player.y)
+
+        if self.config['separation']:
+            self._separate_enemies()
+
+        # Clearance between the player and every enemy, the nearest one scores like AvoidGame's
+        dist = np.hypot(self.player.x - self.enemy_x, self.player.y - self.enemy_y) - (self.player.radius + self.config['enemy']['radius'])
+
+        if len(dist) == 0:
+            return
+
+        nearest = dist.min()
+        if nearest < 0:
+            self.lives = 0
+
+        self.score += dt * nearest
+
+    def draw(self):
+        self.screen.fill((0, 0, 0))
+
+        self.player.draw(self.screen)
+
+        radius = self.config['enemy']['radius']
+
+        if self.enemy_image is None:
+            self.enemy_image = pygame.surface.Surface((2 * radius, 2 * radius))
+            self.enemy_image.set_colorkey((0, 0, 0))
+
+            pygame.draw.circle(self.enemy_image, (255, 0, 0), (radius, radius), radius, 0)
+
+        self.screen.blits([(self.enemy_image, (x - radius, y - radius)) for x, y in zip(self.enemy_x, self.enemy_y)], False)
+
+    def get_state_snapshot(self):
+        enemies = tuple(frozen(arr) for arr in (self.enemy_x, self.enemy_y, self.enemy_vx, self.enemy_vy))
+
+        return AvoidSwarmSnapshot(body_state(self.player), enemies, self.score, self.lives, self._get_rng_state())
+
+    def restore_state_snapshot(self, snapshot):
+        if len(snapshot.enemies[0]) != len(self.enemy_x):
+            raise Exception("Snapshot has {0} enemies, the game has {1}".format(len(snapshot.enemies[0]), len(self.enemy_x)))
+
+        set_body_state(self.player, snapshot.player)
+
+        for arr, saved in zip((self.enemy_x, self.enemy_y, self.enemy_vx, self.enemy_vy), snapshot.enemies):
+            arr[:] = saved
+
+        self.score, self.lives = snapshot.score, snapshot.lives
+        self._set_rng_state(snapshot.rng)
+
+    def get_game_state(self):
+        state = {
+            "player_x":     self.player.x,
+            "player_y":     self.player.y,
+            "player_vx":    self.player.vx,
+            "player_vy":    self.player.vy,
+            "enemy_x":      self.enemy_x.copy(),
+            "enemy_y":      self.enemy_y.copy(),
+            "enemy_vx":     self.enemy_vx.copy(),
+            "enemy_vy":     self.enemy_vy.copy()
+        }
+
+        return state
+
+    # Array observation: player [x, y, vx, vy], then the enemies' x, y, vx and vy as four blocks
+    def get_observation_layout(self):
+        w, h = self.config['width'], self.config['height']
+        ps, es = self.config['player']['max_speed'], self.config['enemy']['max_speed']
+        n = self.config['num_enemies']
+
+        low = np.concatenate(([0, 0, -ps, -ps], np.repeat([0, 0, -es, -es], n))).astype(np.float64)
+        high = np.concatenate(([w, h, ps, ps], np.repeat([w, h, es, es], n))).astype(np.float64)
+
+        return low, high
+
+    def fill_observation(self, out):
+        n = len(self.enemy_x)
+
+        out[0] = self.player.x
+        out[1] = self.player.y
+        out[2] = self.player.vx
+        out[3] = self.player.vy
+
+        out[4:4 + n] = self.enemy_x
+        out[4 + n:4 + 2 * n] = self.enemy_y
+        out[4 + 2 * n:4 + 3 * n] = self.enemy_vx
+        out[4 + 3 * n:4 + 4 * n] = self.enemy_vy
+
+        return out
+
+if __name__ == "__main__":
+    game = AvoidSwarm(width=512, height=512, num_enemies=200)
+    game.setup(display=True)
+    game.init()
+
+    while True:
+        dt = game.tick(30)
+        if game.is_game_over():
+            game.reset()
+
+        game.step(dt)
+        game.draw()
+        pygame.display.update()
@@ -0,0 +1,127 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+# Directions, as numbered by atesim.Entity
+NONE, UP, DOWN, LEFT, RIGHT = 0, 1, 2, 3, 4
+
+# Registered behaviors by scenario name: kernels[name] is the array kernel, functions[name]
+# the per-enemy function. Names in function_only were registered without a kernel, ATESim
+# calls their function with each Enemy instead of going through the generated kernel
+kernels = {}
+functions = {}
+function_only = set()
+
+# Array kernels: take the positions of every enemy in a group (int arrays of any shape)
+# together with the matching player position (scalars or arrays broadcasting against them)
+# and return all their directions at once
+def chase_kernel(x, y, px, py):
+    distx = x - px
+    disty = y - py
+
+    return np.where(
+        np.abs(distx) > np.abs(disty),
+        np.where(distx < 0, RIGHT, LEFT),
+        np.where(disty < 0, DOWN, UP)
+    )
+
+def ymirror_kernel(x, y, px, py):
+    return np.where(y < py, DOWN, np.where(y > py, UP, NONE))
+
+def xmirror_kernel(x, y, px, py):
+    return np.where(x < px, RIGHT, np.where(x > px, LEFT, NONE))
+
+# Per-enemy functions: take one enemy (anything with x and y: an atesim.Enemy, or a Position
+# where no Enemy exists) and the player position
+def chase(self, px, py):
+    disty = self.y - py
+    distx = self.x - px
+
+    if abs(distx) > abs(disty):
+        if distx < 0:
+            return RIGHT
+        else:
+            return LEFT
+    else:
+        if disty < 0:
+            return DOWN
+        else:
+            return UP
+
+def ymirror(self, px, py):
+    if self.y < py:
+        return DOWN
+    elif self.y > py:
+        return UP
+    else:
+        return NONE
+
+def xmirror(self, px, py):
+    if self.x < px:
+        return RIGHT
+    elif self.x > px:
+        return LEFT
+    else:
+        return NONE
+
+class Position:
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+def _function_of(kernel):
+    def function(self, px, py):
+        return int(kernel(np.int64(self.x), np.int64(self.y), px, py))
+
+    return function
+
+def _kernel_of(function):
+    def kernel(x, y, px, py):
+        x, y, px, py = np.broadcast_arrays(x, y, px, py)
+
+        dirs = [function(Position(int(ex), int(ey)), int(qx), int(qy)) for ex, ey, qx, qy in zip(x.flat, y.flat, px.flat, py.flat)]
+        return np.array(dirs, dtype=np.int64).reshape(x.shape)
+
+    return kernel
+
+def register_behavior(name, kernel=None, function=None):
+    # Makes a behavior available to scenarios under name. kernel(x, y, px, py) moves every
+    # enemy using it with one call per tick, so give one wherever the behavior can be written
+    # with array operations; a behavior given only as a per-enemy function(enemy, px, py) is
+    # run through it one enemy at a time. The two must agree when both are given. Names can
+    # only be registered once, compiled scenarios are cached with their behaviors resolved
+    if kernel is None and function is None:
+        raise Exception("Behavior {0!r} needs a kernel or a function".format(name))
+
+    if name in kernels:
+        raise Exception("Behavior {0!r} is already registered".format(name))
+
+    kernels[name] = kernel or _kernel_of(function)
+    functions[name] = function or _function_of(kernel)
+
+    if kernel is None:
+        function_only.add(name)
+
+class BehaviorTable(MutableMapping):
+    # The per-enemy functions by name, as atesim.behaviors has always exposed them. Assigning
+    # behaviors[name] = function registers function (without a kernel), so scenarios can use it
+    def __getitem__(self, name):
+        return functions[name]
+
+    def __setitem__(self, name, function):
+        register_behavior(name, function=function)
+
+    def __delitem__(self, name):
+        raise Exception("Behavior {0!r} cannot be unregistered".format(name))
+
+    def __iter__(self):
+        return iter(functions)
+
+    def __len__(self):
+        return len(functions)
+
+register_behavior("chase", chase_kernel, chase)
+register_behavior("ymirror", ymirror_kernel, ymirror)
+register_behavior("xmirror", xmirror_kernel, xmirror)
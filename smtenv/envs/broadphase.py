@@ -0,0 +1,99 @@
+import numpy as np
+
+# Cell offsets whose pairs build_pairs collects: a cell with itself and half of its neighbors,
+# so every pair of adjacent cells is visited once
+_HALF_NEIGHBORHOOD = ((1, 0), (-1, 1), (0, 1), (1, 1))
+
+def _expand(starts, counts):
+    # Positions starts[k], starts[k] + 1, ..., starts[k] + counts[k] - 1 for every k, and the k
+    # each one belongs to
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    return owner, np.repeat(starts, counts) + offsets
+
+class UniformGrid:
+    # Broad phase for circles with radii up to radius: bodies are bucketed into square cells
+    # of side 2 * radius, so bodies can only touch when their cells are the same or adjacent.
+    # build sorts the bodies by cell (once per step), pairs and near then return candidate
+    # index arrays for an exact circle test, without looking at bodies in far away cells
+    def __init__(self, radius):
+        self.cell_size = 2.0 * radius
+
+        self.n = 0
+        self.order = np.zeros(0, dtype=np.int64)
+        self.sorted_keys = self.order
+
+    def _cells(self, x, y):
+        return np.floor(np.asarray(x) / self.cell_size).astype(np.int64), np.floor(np.asarray(y) / self.cell_size).astype(np.int64)
+
+    def build(self, x, y):
+        cx, cy = self._cells(x, y)
+        self.n = len(cx)
+
+        if self.n:
+            self.min_x, self.min_y = cx.min(), cy.min()
+
+            # Two spare columns, so the columns left and right of the grid never hold bodies
+            self.columns = cx.max() - self.min_x + 3
+        else:
+            self.min_x, self.min_y, self.columns = 0, 0, 3
+
+        self.keys = self._keys(cx, cy)
+        self.order = np.argsort(self.keys, kind="stable")
+        self.sorted_keys = self.keys[self.order]
+
+    def _keys(self, cx, cy):
+        return (cy - self.min_y) * self.columns + (cx - self.min_x + 1)
+
+    def pairs(self):
+        # Candidate pairs (i, j), i < j, of bodies in the same or adjacent cells
+        sorted_keys = self.sorted_keys
+        rank = np.arange(self.n)
+
+        # Later bodies of the same cell
+        end = np.searchsorted(sorted_keys, sorted_keys, "right")
+        owner, other = _expand(rank + 1, end - rank - 1)
+        first, second = [owner], [other]
+
+        for dx, dy in _HALF_NEIGHBORHOOD:
+            target = sorted_keys + dy * self.columns + dx
+
+            start = np.searchsorted(sorted_keys, target, "left")
+            owner, other = _expand(start, np.searchsorted(sorted_keys, target, "right") - start)
+
+            first.append(owner)
+            second.append(other)
+
+        i, j = self.order[np.concatenate(first)], self.order[np.concatenate(second)]
+
+        return np.minimum(i, j), np.maximum(i, j)
+
+    def near(self, x, y):
+        # Candidate bodies for a circle of radius at most radius centered at (x, y)
+        if self.n == 0:
+            return self.order
+
+        cx, cy = self._cells(x, y)
+        key = self._keys(cx, cy)
+
+        # Further than a column from the grid's sides, nothing is near
+        if not 0 <= int(cx) - self.min_x + 1 < self.columns:
+            return self.order[:0]
+
+        # Each row of three cells is one run of keys (spare columns wrap onto empty cells)
+        found = []
+        for dy in (-1, 0, 1):
+            lo = np.searchsorted(self.sorted_keys, key + dy * self.columns - 1, "left")
+            hi = np.searchsorted(self.sorted_keys, key + dy * self.columns + 1, "right")
+
+            found.append(self.order[lo:hi])
+
+        return np.concatenate(found)
+
+def touching(x, y, radius, i, j):
+    # Which candidate pairs (i, j) of circles of the given radius (one for all, or per body)
+    # actually overlap, with the same test as AvoidGame.step: negative clearance
+    radius = np.broadcast_to(radius, np.shape(x))
+
+    return np.hypot(x[i] - x[j], y[i] - y[j]) - (radius[i] + radius[j]) < 0
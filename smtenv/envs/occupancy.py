@@ -0,0 +1,127 @@
+import numpy as np
+
+class OccupancyIndex:
+    # Which entities stand on which cell of a width x height grid, kept up to date as they
+    # move (cells are numbered y * width + x). Looking up a cell is O(1), and the entities
+    # within a Manhattan radius of a cell are found by visiting only the cells of that diamond
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+        # Entity indices on each occupied cell, empty cells have no entry
+        self.cells = {}
+
+    def rebuild(self, x, y):
+        # Indexes entity i at (x[i], y[i]), for arrays of positions
+        cells = {}
+        width = self.width
+
+        for i, (ex, ey) in enumerate(zip(x.tolist(), y.tolist())):
+            cells.setdefault(ey * width + ex, []).append(i)
+
+        self.cells = cells
+
+    def move(self, i, old, new):
+        # Entity i went from cell old to cell new
+        if old == new:
+            return
+
+        bucket = self.cells[old]
+        bucket.remove(i)
+        if not bucket:
+            del self.cells[old]
+
+        self.cells.setdefault(new, []).append(i)
+
+    def move_many(self, idx, old, new):
+        # move for arrays of entities and cells
+        for i, a, b in zip(idx.tolist(), old.tolist(), new.tolist()):
+            self.move(i, a, b)
+
+    def count(self, x, y):
+        return len(self.cells.get(y * self.width + x, ()))
+
+    @staticmethod
+    def area(radius):
+        # Cells in a diamond of radius, ignoring the grid's edges
+        return 2 * radius * (radius + 1) + 1
+
+    def within(self, x, y, radius):
+        # Sorted indices of the entities at most radius (Manhattan) away from (x, y)
+        width, cells = self.width, self.cells
+        found = []
+
+        if len(cells) < self.area(radius):
+            # Fewer occupied cells than the diamond has, check those instead
+            for cell, bucket in cells.items():
+                cy, cx = divmod(cell, width)
+
+                if abs(cx - x) + abs(cy - y) <= radius:
+                    found.extend(bucket)
+        else:
+            for cy in range(max(0, y - radius), min(self.height - 1, y + radius) + 1):
+                rx = radius - abs(cy - y)
+                row = cy * width
+
+                for cx in range(max(0, x - rx), min(width - 1, x + rx) + 1):
+                    bucket = cells.get(row + cx)
+                    if bucket:
+                        found.extend(bucket)
+
+        found.sort()
+        return found
+
+class SortedOccupancyIndex(OccupancyIndex):
+    # OccupancyIndex for many entities moving at once, updated with array operations: a lookup
+    # compares every entity's cell at once, and entity cells are sorted again (nearly sorted, so
+    # cheaply) before the next diamond query, which takes one binary search per row of the
+    # diamond. Nothing is kept per grid cell, so rebuilding costs O(entities) on any grid
+    def __init__(self, width, height):
+        OccupancyIndex.__init__(self, width, height)
+
+        self.entity_cells = np.zeros(0, dtype=np.int64)
+        self.order = self.entity_cells
+        self.sorted_cells = self.entity_cells
+
+        self.dirty = False
+
+    def rebuild(self, x, y):
+        self.entity_cells = y * self.width + x
+        self.dirty = True
+
+    def move(self, i, old, new):
+        self.entity_cells[i] = new
+        self.dirty = True
+
+    def move_many(self, idx, old, new):
+        self.entity_cells[idx] = new
+        self.dirty = True
+
+    def _sort(self):
+        if self.dirty:
+            self.order = np.argsort(self.entity_cells, kind="stable")
+            self.sorted_cells = self.entity_cells[self.order]
+            self.dirty = False
+
+    def count(self, x, y):
+        return int(np.count_nonzero(self.entity_cells == y * self.width + x))
+
+    def within(self, x, y, radius):
+        self._sort()
+
+        rows = np.arange(max(0, y - radius), min(self.height - 1, y + radius) + 1)
+        rx = radius - np.abs(rows - y)
+
+        first = rows * self.width + np.maximum(0, x - rx)
+        last = rows * self.width + np.minimum(self.width - 1, x + rx)
+
+        starts = np.searchsorted(self.sorted_cells, first, "left").tolist()
+        ends = np.searchsorted(self.sorted_cells, last, "right").tolist()
+
+        found = []
+        for start, end in zip(starts, ends):
+            if start < end:
+                found.extend(self.order[start:end].tolist())
+
+        found.sort()
+        return found
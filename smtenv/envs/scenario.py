@@ -0,0 +1,175 @@
+import os
+import json
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+from smtenv.envs import behaviors
+
+# A compiled enemy: behavior_name is its scenario name, behavior and kernel the per-enemy
+# function and array kernel registered under it
+EnemySpec = namedtuple("EnemySpec", ["id", "x", "y", "behavior_name", "behavior", "kernel", "action_rate"])
+
+# Compiled scenarios by content digest, and digests of scenario files by path and stat
+_compiled = {}
+_paths = {}
+
+def _canonical(config):
+    # NumPy scalars are written as the Python numbers they hold
+    return json.dumps(config, sort_keys=True, separators=(",", ":"), default=lambda v: v.item())
+
+def _check(cond, message):
+    if not cond:
+        raise Exception("Invalid scenario: " + message)
+
+def _is_int(v):
+    return isinstance(v, (int, np.integer)) and not isinstance(v, bool)
+
+class Scenario:
+    # An ATESim scenario compiled once: validated, with behaviors resolved, spawn tables built
+    # and positions as read-only arrays. Scenarios are immutable and compared and hashed by
+    # content; compile returns the cached instance for a scenario it has seen, and pickling
+    # sends only the canonical JSON, which the receiving process compiles (and caches) once
+    __slots__ = (
+        "source", "digest", "width", "height", "cellsize", "player_x", "player_y", "vision",
+        "random", "min_dist", "enemies", "enemy_ids", "enemy_x", "enemy_y", "action_rate",
+        "behavior_groups", "spawn_sampler"
+    )
+
+    @staticmethod
+    def compile(config={}, config_preproccesor = lambda p: p):
+        # Scenario of a config, or of whatever config_preproccesor turns it into (e.g. a path
+        # read by ATESim.path_preprocessor). Files are only read again once they change
+        if isinstance(config, Scenario):
+            return config
+
+        key = None
+        if isinstance(config, str) and os.path.exists(config):
+            stat = os.stat(config)
+            key = (config_preproccesor, os.path.abspath(config), stat.st_mtime_ns, stat.st_size)
+
+            if key in _paths:
+                return _compiled[_paths[key]]
+
+        config = config_preproccesor(config)
+        if isinstance(config, Scenario):
+            return config
+
+        scenario = Scenario.from_json(_canonical(config))
+
+        if key is not None:
+            _paths[key] = scenario.digest
+
+        return scenario
+
+    @staticmethod
+    def from_json(source):
+        digest = hashlib.sha256(source.encode()).hexdigest()
+
+        if digest not in _compiled:
+            _compiled[digest] = Scenario(source, digest)
+
+        return _compiled[digest]
+
+    def __init__(self, source, digest):
+        config = json.loads(source)
+        put = object.__setattr__
+
+        put(self, "source", source)
+        put(self, "digest", digest)
+
+        for key in ("width", "height", "cellsize"):
+            _check(_is_int(config.get(key)) and config[key] > 0, "{0} must be a positive integer".format(key))
+
+        width, height = config["width"], config["height"]
+
+        player = config.get("player")
+        _check(isinstance(player, dict), "missing player")
+        _check(_is_int(player.get("x")) and 0 <= player["x"] < width, "player x outside the grid")
+        _check(_is_int(player.get("y")) and 0 <= player["y"] < height, "player y outside the grid")
+
+        vision = player.get("vision") or None
+        _check(vision is None or (_is_int(vision) and vision > 0), "vision must be a positive integer")
+
+        put(self, "width", width)
+        put(self, "height", height)
+        put(self, "cellsize", config["cellsize"])
+        put(self, "player_x", player["x"])
+        put(self, "player_y", player["y"])
+        put(self, "vision", vision)
+        put(self, "random", bool(config.get("random")))
+        put(self, "min_dist", config.get("mind_dist") or config.get("min_dist") or 1)
+
+        enemies = []
+        for i, enemy in enumerate(config.get("enemies", [])):
+            name = enemy.get("behavior")
+            _check(name in behaviors.kernels, "enemy {0} has unknown behavior {1!r}".format(i, name))
+            _check(_is_int(enemy.get("action_rate")) and enemy["action_rate"] > 0, "enemy {0} action_rate must be a positive integer".format(i))
+
+            if not self.random:
+                _check(_is_int(enemy.get("x")) and 0 <= enemy["x"] < width, "enemy {0} x outside the grid".format(i))
+                _check(_is_int(enemy.get("y")) and 0 <= enemy["y"] < height, "enemy {0} y outside the grid".format(i))
+
+            enemies.append(EnemySpec(
+                enemy.get("id"), enemy.get("x"), enemy.get("y"), name,
+                behaviors.functions[name], behaviors.kernels[name], enemy["action_rate"]
+            ))
+
+        put(self, "enemies", tuple(enemies))
+        put(self, "enemy_ids", tuple(e.id for e in enemies))
+
+        def frozen(values):
+            arr = np.array(values, dtype=np.int64)
+            arr.flags.writeable = False
+            return arr
+
+        # Scenario spawn positions, meaningless (zero) for random scenarios
+        put(self, "enemy_x", frozen([e.x or 0 for e in enemies]))
+        put(self, "enemy_y", frozen([e.y or 0 for e in enemies]))
+        put(self, "action_rate", frozen([e.action_rate for e in enemies]))
+
+        # (name, kernel, enemy indices) per behavior: the enemies moved by one kernel call
+        put(self, "behavior_groups", tuple(
+            (name, behaviors.kernels[name], frozen([i for i, e in enumerate(enemies) if e.behavior_name == name]))
+            for name in sorted(set(e.behavior_name for e in enemies))
+        ))
+
+        sampler = None
+        if self.random:
+            # Imported here, atesim itself imports this module
+            from smtenv.envs.atesim import SpawnSampler
+
+            sampler = SpawnSampler(width, height, self.player_x, self.player_y, self.min_dist)
+            _check(len(enemies) <= sampler.n_eligible, "{0} enemies do not fit on {1} eligible cells".format(len(enemies), sampler.n_eligible))
+
+        put(self, "spawn_sampler", sampler)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Scenario is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Scenario is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, Scenario) and other.digest == self.digest
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __reduce__(self):
+        return (Scenario.from_json, (self.source,))
+
+    def __repr__(self):
+        return "Scenario({0}x{1}, {2} enemies, {3})".format(self.width, self.height, len(self.enemies), self.digest[:12])
+
+    @property
+    def n_enemies(self):
+        return len(self.enemies)
+
+    def to_config(self):
+        # A fresh copy of the scenario dict, safe to modify
+        return json.loads(self.source)
@@ -0,0 +1,207 @@
+import numpy as np
+
+from smtenv.envs.atesim import Entity
+from smtenv.envs.scenario import Scenario
+
+# Player direction for each action index
+_player_dirs = np.array([Entity.LEFT, Entity.RIGHT, Entity.UP, Entity.DOWN, Entity.NONE])
+
+class VectorATESim:
+    # Action indices, in the order SMTEnv exposes ATESim's action set (anything else is a no-op)
+    LEFT, RIGHT, UP, DOWN, NOOP = 0, 1, 2, 3, 4
+
+    # Steps N independent ATESim episodes of one scenario at once. All dynamic state lives in
+    # struct-of-arrays buffers with the episode index as the first axis; each episode follows
+    # exactly the transitions (and rewards, as SMTEnv reports them) of an ATESim instance.
+    # Every episode has its own generator for random spawns, see seed
+    def __init__(self, num_envs, config={}, config_preproccesor = lambda p: p, seed=None):
+        self.scenario = scenario = Scenario.compile(config, config_preproccesor)
+
+        self.config = scenario.to_config()
+        self.num_envs = num_envs
+
+        self.grid_width = scenario.width
+        self.grid_height = scenario.height
+        self.vision = scenario.vision
+
+        self.spawn_sampler = scenario.spawn_sampler
+
+        self.enemy_ids = list(scenario.enemy_ids)
+        self.action_rate = scenario.action_rate
+
+        # Enemy columns sharing a behavior are moved with one kernel call
+        self.behavior_groups = [(kernel, idx) for _, kernel, idx in scenario.behavior_groups]
+
+        n, e = num_envs, scenario.n_enemies
+
+        self.player_x = np.zeros(n, dtype=np.int64)
+        self.player_y = np.zeros(n, dtype=np.int64)
+        self.enemy_x = np.zeros((n, e), dtype=np.int64)
+        self.enemy_y = np.zeros((n, e), dtype=np.int64)
+        self.action_tick = np.zeros((n, e), dtype=np.int64)
+
+        self.score = np.zeros(n, dtype=np.float64)
+        self.rwd = np.zeros(n, dtype=np.float64)
+        self.lives = np.zeros(n, dtype=np.int64)
+        self.timestep = np.zeros(n, dtype=np.int64)
+
+        self.seed(seed)
+        self.reset()
+
+    def seed(self, seed=None):
+        # One seed per episode, or a single int: episode i then draws its spawns exactly like
+        # an ATESim with rng_seed=seed + i
+        if seed is None or np.ndim(seed) == 0:
+            seeds = [None if seed is None else seed + i for i in range(self.num_envs)]
+        else:
+            seeds = list(seed)
+
+            if len(seeds) != self.num_envs:
+                raise Exception("Got {0} seeds for {1} episodes".format(len(seeds), self.num_envs))
+
+        # Fixed scenarios draw nothing, so they skip creating the generators
+        self.rngs = [np.random.RandomState(seed=s) for s in seeds] if self.spawn_sampler is not None else []
+
+    def reset(self, mask=None):
+        # Resets every episode, or only those selected by a boolean mask / index array
+        if mask is None:
+            idx = np.arange(self.num_envs)
+        else:
+            idx = np.asarray(mask)
+
+            if idx.dtype == bool:
+                idx = np.flatnonzero(idx)
+
+        self.player_x[idx] = self.scenario.player_x
+        self.player_y[idx] = self.scenario.player_y
+        self.action_tick[idx] = 0
+
+        self.score[idx] = 0
+        self.rwd[idx] = 0
+        self.lives[idx] = 1
+        self.timestep[idx] = 0
+
+        if self.scenario.random:
+            for i in idx:
+                spawns = self.spawn_sampler.sample(len(self.enemy_ids), self.rngs[i])
+
+                self.enemy_x[i] = [x for x, _ in spawns]
+                self.enemy_y[i] = [y for _, y in spawns]
+        else:
+            self.enemy_x[idx] = self.scenario.enemy_x
+            self.enemy_y[idx] = self.scenario.enemy_y
+
+    def is_game_over(self):
+        return self.lives == 0
+
+    def _move(self, x, y, dirs, active):
+        up = active & (dirs == Entity.UP) & (y > 0)
+        down = active & (dirs == Entity.DOWN) & (y < self.grid_height - 1)
+        left = active & (dirs == Entity.LEFT) & (x > 0)
+        right = active & (dirs == Entity.RIGHT) & (x < self.grid_width - 1)
+
+        y -= up
+        y += down
+        x -= left
+        x += right
+
+    def step(self, actions):
+        # Advances every running episode by one tick and returns (rewards, dones); finished
+        # episodes are left untouched (reward 0) until they are reset
+        actions = np.asarray(actions)
+        active = self.lives != 0
+
+        previous_score = self.score.copy()
+
+        valid = (actions >= 0) & (actions < self.NOOP)
+        player_dirs = _player_dirs[np.where(valid, actions, self.NOOP)]
+        self._move(self.player_x, self.player_y, player_dirs, active)
+
+        if self.enemy_x.shape[1] > 0:
+            running = active[:, None]
+
+            self.action_tick += running
+            fire = running & (self.action_tick == self.action_rate)
+
+            px, py = self.player_x[:, None], self.player_y[:, None]
+
+            dirs = np.full(self.enemy_x.shape, Entity.NONE, dtype=np.int64)
+            for kernel, idx in self.behavior_groups:
+                dirs[:, idx] = kernel(self.enemy_x[:, idx], self.enemy_y[:, idx], px, py)
+
+            self.action_tick[fire] = 0
+            self._move(self.enemy_x, self.enemy_y, dirs, fire)
+
+            dist = np.abs(self.enemy_x - px) + np.abs(self.enemy_y - py)
+            hit = dist == 0
+
+            # Same reward rule as ATESim.step: the last enemy decides between the collision
+            # penalty and the squared total distance
+            rwd = np.where(hit[:, -1], -1000.0, dist.sum(axis=1).astype(np.float64) ** 2)
+
+            self.rwd[active] = rwd[active]
+            self.timestep[active] += (~hit[active]).sum(axis=1)
+            self.lives[active & hit.any(axis=1)] = 0
+
+        self.score[active] += self.rwd[active]
+
+        return self.score - previous_score, self.is_game_over()
+
+    def observe(self):
+        # Player positions (N, 2), enemy offsets as reported by ATESim (N, E, 2) and whether
+        # each enemy is inside the player's vision (N, E)
+        px, py = self.player_x[:, None], self.player_y[:, None]
+
+        offsets = np.stack((self.enemy_x - px, py - self.enemy_y), axis=-1)
+
+        if self.vision is None:
+            visible = np.ones(self.enemy_x.shape, dtype=bool)
+        else:
+            visible = np.abs(self.enemy_x - px) + np.abs(self.enemy_y - py) <= self.vision
+
+        return np.stack((self.player_x, self.player_y), axis=-1), offsets, visible
+
+    def get_observation_layout(self):
+        # Per-episode layout of ATESim's array observation
+        w, h = self.grid_width, self.grid_height
+        n = len(self.enemy_ids)
+
+        low = np.array([0, 0] + [0, -(w - 1), -(h - 1)] * n, dtype=np.int64)
+        high = np.array([w - 1, h - 1] + [1, w - 1, h - 1] * n, dtype=np.int64)
+
+        return low, high
+
+    def fill_observations(self, out=None):
+        # ATESim's array observation for every episode, written into out (N, 2 + 3E)
+        if out is None:
+            out = np.zeros((self.num_envs, 2 + 3 * len(self.enemy_ids)), dtype=np.int64)
+
+        players, offsets, visible = self.observe()
+
+        slots = out[:, 2:].reshape(self.num_envs, -1, 3)
+
+        out[:, :2] = players
+        slots[..., 0] = visible
+        slots[..., 1:] = offsets * visible[..., None]
+
+        return out
+
+    def get_game_state(self, i):
+        # The state dict ATESim.get_game_state would return for episode i
+        px, py = int(self.player_x[i]), int(self.player_y[i])
+
+        enemies = []
+        for j, eid in enumerate(self.enemy_ids):
+            ex, ey = int(self.enemy_x[i, j]), int(self.enemy_y[i, j])
+
+            if self.vision is None or abs(px - ex) + abs(py - ey) <= self.vision:
+                enemies.append((eid, ex - px, py - ey))
+
+        return {
+            "player_x":     px,
+            "player_y":     py,
+            "enemies":      enemies
+        }
+
+    def get_game_states(self):
+        return [self.get_game_state(i) for i in range(self.num_envs)]
@@ -0,0 +1,14 @@
+# The pygame (SDL2) event types and key codes the games use, so action sets can be built
+# without importing pygame. These are pygame 2's values (SDL1's K_UP is 273, for one), which is
+# why setup.py requires pygame>=2
+
+QUIT = 256
+KEYDOWN = 768
+KEYUP = 769
+
+K_UP = 1073741906
+K_DOWN = 1073741905
+K_LEFT = 1073741904
+K_RIGHT = 1073741903
+
+K_F15 = 1073741930
@@ -0,0 +1,49 @@
+import numpy as np
+
+# ITU-R 601 luma weights
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+class PixelObservation:
+    # Pixel observations of a game's frames (see BaseGame.render_frame), optionally downscaled
+    # to shape = (height, width) and/or converted to grayscale. Processing happens in place into
+    # buffers allocated once; without it observe returns the frame view itself
+    def __init__(self, game, shape=None, grayscale=False):
+        self.game = game
+        self.grayscale = grayscale
+
+        width, height = game.get_screen_dims()
+        self.size = (width, height) if shape is None else (shape[1], shape[0])
+
+        self.scaled = None
+        if self.size != (width, height):
+            import pygame
+
+            self.scaled_pixels = np.zeros((self.size[1], self.size[0], 4), dtype=np.uint8)
+            self.scaled = pygame.image.frombuffer(self.scaled_pixels, self.size, "RGBX")
+
+        self.out = None
+        if grayscale:
+            self.gray = np.zeros((self.size[1], self.size[0]), dtype=np.float32)
+            self.out = np.zeros((self.size[1], self.size[0]), dtype=np.uint8)
+
+    @property
+    def shape(self):
+        return (self.size[1], self.size[0]) if self.grayscale else (self.size[1], self.size[0], 3)
+
+    def get_observation_layout(self):
+        return np.zeros(self.shape, dtype=np.uint8), np.full(self.shape, 255, dtype=np.uint8)
+
+    def observe(self):
+        frame = self.game.render_frame()
+
+        if self.scaled is not None:
+            import pygame
+            pygame.transform.smoothscale(self.game.offscreen, self.size, self.scaled)
+            frame = self.scaled_pixels[:, :, :3]
+
+        if self.grayscale:
+            np.einsum("ijk,k->ij", frame, GRAY_WEIGHTS, out=self.gray)
+            np.copyto(self.out, self.gray, casting="unsafe")
+            return self.out
+
+        return frame
@@ -0,0 +1,118 @@
+import time
+
+# Phases of _GameWrapper.act / SMTEnv.step / SMTEnv.reset that can be timed
+PHASES = ("do_action", "tick", "step", "draw", "get_game_state", "state_preprocessor", "reset_game")
+
+# Histogram bucket b counts durations of b bits in nanoseconds, i.e. in [2^(b-1), 2^b) ns; the
+# last bucket also takes everything longer (2^31 ns is about 2 seconds)
+N_BUCKETS = 32
+
+class PhaseStats:
+    __slots__ = ("count", "total", "min", "max", "last", "buckets")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.last = 0
+        self.buckets = [0] * N_BUCKETS
+
+    def add(self, ns):
+        self.count += 1
+        self.total += ns
+        self.last = ns
+
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if ns > self.max:
+            self.max = ns
+
+        self.buckets[min(ns.bit_length(), N_BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        # Upper bound (ns) of the histogram bucket holding the q-th percentile
+        if self.count == 0:
+            return 0
+
+        rank = q / 100.0 * self.count
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(2 ** b, self.max)
+
+        return self.max
+
+    def summary(self):
+        return {
+            "count":    self.count,
+            "total_s":  self.total / 1e9,
+            "mean_us":  self.total / self.count / 1e3 if self.count else 0.0,
+            "min_us":   (self.min or 0) / 1e3,
+            "max_us":   self.max / 1e3,
+            "p50_us":   self.percentile(50) / 1e3,
+            "p90_us":   self.percentile(90) / 1e3,
+            "p99_us":   self.percentile(99) / 1e3,
+            "buckets":  list(self.buckets)
+        }
+
+class StepProfiler:
+    # Wall time per phase, from the monotonic perf_counter_ns clock. Phases are timed by
+    # wrapping the callables _GameWrapper uses, so a wrapper without a profiler runs untouched
+    def __init__(self):
+        self.phases = dict((phase, PhaseStats()) for phase in PHASES)
+
+        # Nanoseconds spent in each phase since begin_step
+        self.current = dict.fromkeys(PHASES, 0)
+
+    def wrap(self, phase, fn):
+        stats = self.phases[phase]
+        current = self.current
+        clock = time.perf_counter_ns
+
+        def timed(*args):
+            start = clock()
+            result = fn(*args)
+
+            ns = clock() - start
+            stats.add(ns)
+            current[phase] += ns
+
+            return result
+
+        return timed
+
+    def begin_step(self):
+        for phase in PHASES:
+            self.current[phase] = 0
+
+    def step_times(self):
+        # Nanoseconds spent in each phase since begin_step, summed over the ticks of a
+        # frame-skipped step; 0 for phases that did not run
+        return dict(self.current)
+
+    def last(self):
+        # Nanoseconds spent in each phase the last time it ran
+        return dict((phase, stats.last) for phase, stats in self.phases.items())
+
+    def summary(self):
+        return dict((phase, stats.summary()) for phase, stats in self.phases.items())
+
+    def reset(self):
+        for stats in self.phases.values():
+            stats.reset()
+
+    def __str__(self):
+        lines = ["{0:<20}{1:>10}{2:>12}{3:>12}{4:>12}{5:>12}".format("phase", "count", "mean us", "p50 us", "p99 us", "total s")]
+
+        for phase, stats in self.phases.items():
+            s = stats.summary()
+            lines.append("{0:<20}{1:>10}{2:>12.2f}{3:>12.2f}{4:>12.2f}{5:>12.4f}".format(
+                phase, s["count"], s["mean_us"], s["p50_us"], s["p99_us"], s["total_s"]
+            ))
+
+        return "\n".join(lines)
@@ -0,0 +1,286 @@
+import os
+import json
+import queue
+import threading
+
+import numpy as np
+import gym
+
+INDEX = "index.json"
+
+def _chunk_file(path, field, chunk):
+    return os.path.join(path, "{0}.{1:06d}.npy".format(field, chunk))
+
+class Recorder(gym.Wrapper):
+    # Streams every transition of the wrapped env to a directory, as columns split in chunks of
+    # chunk_size rows: one .npy file per field and chunk, plus index.json listing the chunks.
+    # Fields are obs, action, reward, done, episode and, with next_obs=True, next_obs.
+    # Observations must be fixed-shape numeric arrays (array or pixel observations, or a
+    # state_preprocessor returning arrays).
+    #
+    # step only copies into preallocated chunk buffers; full chunks are written by a
+    # background thread. At most max_pending chunks wait for it, after which step blocks.
+    # The thread rewrites index.json after every chunk it saves, so a recording stays readable
+    # up to its last written chunk even if the process dies; close (or flush) writes the rest
+    def __init__(self, env, path, chunk_size=4096, next_obs=True, max_pending=4):
+        gym.Wrapper.__init__(self, env)
+
+        self.path = path
+        self.chunk_size = chunk_size
+        self.record_next_obs = next_obs
+
+        os.makedirs(path, exist_ok=True)
+
+        self.index = {"chunk_size": chunk_size, "fields": None, "chunks": []}
+        if os.path.exists(os.path.join(path, INDEX)):
+            with open(os.path.join(path, INDEX)) as f:
+                self.index = json.load(f)
+
+        # Episodes and chunks continue the numbering of an existing recording. Chunk files left
+        # without an index entry by a process that died are overwritten
+        self.episode = -1
+        if self.index["chunks"]:
+            self.episode = self.index["chunks"][-1]["last_episode"]
+        self.next_chunk = len(self.index["chunks"])
+
+        self.buffers = None
+        self.free = queue.Queue()
+        self.row = 0
+        self.last_obs = None
+
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.writer = threading.Thread(target=self._write_chunks, daemon=True)
+        self.writer.start()
+
+        self.closed = False
+
+    def _fields(self, obs):
+        obs = np.asarray(obs)
+        if obs.dtype == object:
+            raise Exception("Observations must be fixed-shape numeric arrays, use array observations or a state_preprocessor")
+
+        fields = {
+            "obs":      (obs.shape, obs.dtype.str),
+            "action":   ((), np.dtype(np.int64).str),
+            "reward":   ((), np.dtype(np.float64).str),
+            "done":     ((), np.dtype(np.bool_).str),
+            "episode":  ((), np.dtype(np.int64).str)
+        }
+
+        if self.record_next_obs:
+            fields["next_obs"] = fields["obs"]
+
+        return fields
+
+    def _new_buffers(self):
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            return dict(
+                (name, np.empty((self.chunk_size,) + tuple(shape), dtype=dtype))
+                for name, (shape, dtype) in self.index["fields"].items()
+            )
+
+    def _write_chunks(self):
+        while True:
+            item = self.pending.get()
+
+            if item is None:
+                self.pending.task_done()
+                break
+
+            number, rows, buffers, chunk = item
+
+            try:
+                if self.error is None:
+                    for name, arr in buffers.items():
+                        np.save(_chunk_file(self.path, name, number), arr[:rows])
+
+                    # Indexed once all of its files are written, so the index only lists
+                    # complete chunks
+                    self.index["chunks"].append(chunk)
+                    self._write_index()
+            except Exception as e:
+                self.error = e
+            finally:
+                self.free.put(buffers)
+                self.pending.task_done()
+
+    def _check(self):
+        if self.error is not None:
+            raise Exception("Recording to {0} failed: {1}".format(self.path, self.error))
+
+    def _write_index(self):
+        tmp = os.path.join(self.path, INDEX + ".tmp")
+
+        with open(tmp, "w") as f:
+            json.dump(self.index, f)
+
+        os.replace(tmp, os.path.join(self.path, INDEX))
+
+    def _submit(self):
+        # Hands the current chunk to the writer thread and starts a new one
+        if self.row == 0:
+            return
+
+        self._check()
+
+        number = self.next_chunk
+        self.next_chunk += 1
+
+        buffers = self.buffers
+
+        chunk = {
+            "rows":             self.row,
+            "first_episode":    int(buffers["episode"][0]),
+            "last_episode":     int(buffers["episode"][self.row - 1])
+        }
+
+        self.pending.put((number, self.row, buffers, chunk))
+
+        self.buffers = None
+        self.row = 0
+
+    def reset(self, **kwargs):
+        obs = self.env.reset(**kwargs)
+        self.episode += 1
+
+        # Compared in their JSON form, as read back from an existing index
+        fields = json.loads(json.dumps(self._fields(obs)))
+
+        if self.index["fields"] is None:
+            self.index["fields"] = fields
+        elif fields != self.index["fields"]:
+            raise Exception("Observations do not match the existing recording in {0}".format(self.path))
+
+        self.last_obs = np.array(obs, dtype=self.index["fields"]["obs"][1])
+
+        return obs
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+
+        if self.last_obs is None:
+            raise Exception("Call reset before step")
+
+        if self.buffers is None:
+            self.buffers = self._new_buffers()
+
+        row, buffers = self.row, self.buffers
+
+        buffers["obs"][row] = self.last_obs
+        buffers["action"][row] = action
+        buffers["reward"][row] = reward
+        buffers["done"][row] = done
+        buffers["episode"][row] = self.episode
+
+        # The env may hand out one reused observation buffer, keep a copy of our own
+        if self.record_next_obs:
+            buffers["next_obs"][row] = obs
+        self.last_obs[...] = obs
+
+        self.row += 1
+        if self.row == self.chunk_size:
+            self._submit()
+
+        return obs, reward, done, info
+
+    def flush(self):
+        # Writes out everything recorded so far, then the index (which the writer thread only
+        # updates once there are chunks)
+        self._submit()
+        self.pending.join()
+        self._check()
+
+        self._write_index()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        try:
+            self.flush()
+        finally:
+            self.pending.put(None)
+            self.writer.join()
+
+            self.env.close()
+
+class ChunkedColumn:
+    # One field of a recording, as a read-only sequence of rows backed by memory-mapped chunk
+    # files; indexing reads only the chunks it touches
+    def __init__(self, chunks, shape, dtype):
+        self.chunks = chunks
+        self.shape = (sum(len(c) for c in chunks),) + tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+        self.offsets = np.cumsum([0] + [len(c) for c in chunks])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("row {0} out of range".format(key))
+
+            c = np.searchsorted(self.offsets, key, side="right") - 1
+            return self.chunks[c][key - self.offsets[c]]
+
+        if isinstance(key, slice):
+            key = np.arange(*key.indices(len(self)))
+
+        rows = np.asarray(key, dtype=np.int64)
+        rows = np.where(rows < 0, rows + len(self), rows)
+
+        out = np.empty(rows.shape + self.shape[1:], dtype=self.dtype)
+        which = np.searchsorted(self.offsets, rows, side="right") - 1
+
+        for c in np.unique(which):
+            sel = which == c
+            out[sel] = self.chunks[c][rows[sel] - self.offsets[c]]
+
+        return out
+
+    def read(self):
+        # The whole column in memory
+        return np.concatenate(self.chunks) if self.chunks else np.empty(self.shape, dtype=self.dtype)
+
+class RecordingReader:
+    # Opens a Recorder directory without loading it: reader["obs"] is a ChunkedColumn over
+    # memory-mapped chunk files, iter_chunks yields one chunk's memmaps at a time
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, INDEX)) as f:
+            self.index = json.load(f)
+
+        self.fields = self.index["fields"] or {}
+        self.n_chunks = len(self.index["chunks"])
+        self.columns = {}
+
+    def __len__(self):
+        return sum(chunk["rows"] for chunk in self.index["chunks"])
+
+    def _chunk(self, field, number):
+        return np.load(_chunk_file(self.path, field, number), mmap_mode="r")
+
+    def __getitem__(self, field):
+        if field not in self.fields:
+            raise KeyError(field)
+
+        if field not in self.columns:
+            shape, dtype = self.fields[field]
+            self.columns[field] = ChunkedColumn([self._chunk(field, i) for i in range(self.n_chunks)], shape, dtype)
+
+        return self.columns[field]
+
+    def iter_chunks(self, fields=None):
+        fields = list(self.fields) if fields is None else fields
+
+        for i in range(self.n_chunks):
+            yield dict((field, self._chunk(field, i)) for field in fields)
@@ -0,0 +1,145 @@
+import json
+import pickle
+import hashlib
+import importlib
+from collections import namedtuple
+
+import numpy as np
+import gym
+
+from smtenv.smtenv import _GameWrapper
+
+# Everything needed to play an episode again: the game (as "module:Class"), its constructor
+# kwargs (the scenario), the wrapper settings that change its dynamics (fps, frame_skip),
+# the seed it was reset with and the action indices taken. checksums[t] is state_checksum
+# of the game after step t, or None when the log carries no checksums
+ActionLog = namedtuple("ActionLog", ["game", "kwargs", "env", "seed", "actions", "checksums"])
+
+def game_path(game_class):
+    return "{0}:{1}".format(game_class.__module__, game_class.__qualname__)
+
+def load_game_class(path):
+    module, name = path.split(":")
+    return getattr(importlib.import_module(module), name)
+
+def state_checksum(game):
+    # 64-bit digest of the game's dynamic state (its snapshot without the generator state,
+    # which only changes on reset), or of get_game_state for games without snapshots
+    try:
+        state = game.get_state_snapshot()._replace(rng=None)
+    except NotImplementedError:
+        state = game.get_game_state()
+
+    digest = hashlib.blake2b(pickle.dumps(state, protocol=4), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+def save_log(log, path):
+    meta = {"game": log.game, "kwargs": log.kwargs, "env": log.env, "seed": log.seed}
+
+    arrays = {"actions": np.asarray(log.actions, dtype=np.int64), "meta": np.array(json.dumps(meta))}
+    if log.checksums is not None:
+        arrays["checksums"] = np.asarray(log.checksums, dtype=np.uint64)
+
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+def load_log(path):
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        checksums = data["checksums"] if "checksums" in data.files else None
+
+        return ActionLog(meta["game"], meta["kwargs"], meta["env"], meta["seed"], data["actions"], checksums)
+
+def _check_fixed_dt(wrapper):
+    # Replays step the game by 1000 / fps ms, a displayed env without lock_fps or a
+    # RenderScheduler steps it by the wall-clock frame time instead
+    if wrapper.display and not wrapper.lock_fps and wrapper.render_schedule is None:
+        raise Exception("Only envs stepping at a fixed dt can be logged: use display_screen=False or a render_schedule")
+
+class ActionLogger(gym.Wrapper):
+    # Records an ActionLog per episode of an SMTEnv. Episodes reset without a seed get a fresh
+    # one, so every episode can be replayed. Finished logs collect in logs; the kwargs must be
+    # the ones the game was built with, and JSON-serializable to save them. The env must step
+    # at a fixed dt, as replays do
+    def __init__(self, env, kwargs={}, checksums=True):
+        gym.Wrapper.__init__(self, env)
+
+        wrapper = env.game_state
+        _check_fixed_dt(wrapper)
+
+        self.game = game_path(type(wrapper.game))
+        self.kwargs = kwargs
+        self.settings = {"fps": wrapper.fps, "frame_skip": wrapper.frame_skip}
+        self.record_checksums = checksums
+
+        self.logs = []
+        self.seed_source = np.random.SeedSequence()
+
+        self.episode_seed = None
+        self.actions = []
+        self.checksums = []
+
+    def current(self):
+        # ActionLog of the episode in progress
+        return ActionLog(
+            self.game, self.kwargs, self.settings, self.episode_seed,
+            np.array(self.actions, dtype=np.int64),
+            np.array(self.checksums, dtype=np.uint64) if self.record_checksums else None
+        )
+
+    def reset(self, seed=None, **kwargs):
+        if self.episode_seed is not None and self.actions:
+            self.logs.append(self.current())
+
+        # The display may have been switched on since
+        _check_fixed_dt(self.env.game_state)
+
+        if seed is None:
+            seed = int(self.seed_source.spawn(1)[0].generate_state(1)[0])
+
+        self.episode_seed = seed
+        self.actions = []
+        self.checksums = []
+
+        return self.env.reset(seed=seed, **kwargs)
+
+    def step(self, action):
+        result = self.env.step(action)
+
+        self.actions.append(action)
+        if self.record_checksums:
+            self.checksums.append(state_checksum(self.env.game_state.game))
+
+        return result
+
+    def close(self):
+        if self.episode_seed is not None and self.actions:
+            self.logs.append(self.current())
+            self.actions = []
+
+        self.env.close()
+
+def replay(log, verify=True, state_preprocessor=None, obs_type="dict"):
+    # Plays a log back headless and yields (observation, reward, done) after every step. With
+    # verify, every step's state is checked against the log's checksums
+    game = load_game_class(log.game)(**log.kwargs)
+    wrapper = _GameWrapper(game, fps=log.env["fps"], display=False, state_preprocessor=state_preprocessor,
+                           obs_type=obs_type, frame_skip=log.env["frame_skip"])
+    action_set = wrapper.get_actions()
+
+    game.seed(log.seed)
+    wrapper.reset_game()
+
+    check = verify and log.checksums is not None
+
+    for t, action in enumerate(log.actions):
+        reward = wrapper.act(action_set[action])
+
+        if check and state_checksum(game) != log.checksums[t]:
+            raise Exception("Replay diverged from the log at step {0}".format(t))
+
+        yield wrapper.get_game_state(), reward, wrapper.game_over()
+
+def verify(log):
+    # Replays a log and returns its total reward, raising if any step diverges
+    return sum(reward for _, reward, _ in replay(log))
@@ -0,0 +1,172 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Transitions of a collection run, in order. obs[t] is the observation actions[t] was taken in;
+# ends[t] marks the last step of an episode (dones[t] if the game ended, otherwise the episode
+# ran out of steps or the run stopped). The episode_* arrays have one entry per episode, and
+# final_obs[k] is the observation after episode k's last step
+Rollout = namedtuple("Rollout", [
+    "obs", "actions", "rewards", "dones", "ends",
+    "episode_returns", "episode_lengths", "episode_dones", "final_obs"
+])
+
+class RingBuffer:
+    # Preallocated array of items of one shape and dtype (object dtype holds anything). It
+    # doubles its capacity when full, until max_size is reached; from then on the oldest
+    # items are overwritten
+    def __init__(self, shape=(), dtype=np.float64, capacity=1024, max_size=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.max_size = max_size
+
+        if max_size is not None:
+            capacity = min(capacity, max_size)
+
+        self.data = np.empty((max(1, capacity),) + self.shape, dtype=self.dtype)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        # Forgets the items, the memory is kept for reuse
+        self.start = 0
+        self.size = 0
+
+    def _grow(self):
+        capacity = len(self.data) * 2
+        if self.max_size is not None:
+            capacity = min(capacity, self.max_size)
+
+        data = np.empty((capacity,) + self.shape, dtype=self.dtype)
+        data[:self.size] = self.view()
+
+        self.data = data
+        self.start = 0
+
+    def append(self, item):
+        capacity = len(self.data)
+
+        if self.size == capacity and (self.max_size is None or capacity < self.max_size):
+            self._grow()
+            capacity = len(self.data)
+
+        if self.size < capacity:
+            self.data[(self.start + self.size) % capacity] = item
+            self.size += 1
+        else:
+            self.data[self.start] = item
+            self.start = (self.start + 1) % capacity
+
+    def set_last(self, item):
+        self.data[(self.start + self.size - 1) % len(self.data)] = item
+
+    def view(self):
+        # Items in order, a view of the storage unless it has wrapped around
+        end = self.start + self.size
+
+        if end <= len(self.data):
+            return self.data[self.start:end]
+
+        return np.concatenate((self.data[self.start:], self.data[:end - len(self.data)]))
+
+class RolloutCollector:
+    # Runs an agent in an env and records every transition into RingBuffers, which are reused
+    # by later collect calls. Observations are stored in the env's observation_space Box when
+    # it declares one (array and pixel observations), as objects otherwise. With max_size set,
+    # only the last max_size steps (and episodes) of a run are kept
+    def __init__(self, env, capacity=1024, max_size=None):
+        self.env = env
+
+        space = getattr(env, "observation_space", None)
+        if space is not None and getattr(space, "shape", None) is not None:
+            obs_shape, obs_dtype = space.shape, space.dtype
+        else:
+            obs_shape, obs_dtype = (), object
+
+        self.obs = RingBuffer(obs_shape, obs_dtype, capacity, max_size)
+        self.actions = RingBuffer((), np.int64, capacity, max_size)
+        self.rewards = RingBuffer((), np.float64, capacity, max_size)
+        self.dones = RingBuffer((), np.bool_, capacity, max_size)
+        self.ends = RingBuffer((), np.bool_, capacity, max_size)
+
+        self.episode_returns = RingBuffer((), np.float64, 64, max_size)
+        self.episode_lengths = RingBuffer((), np.int64, 64, max_size)
+        self.episode_dones = RingBuffer((), np.bool_, 64, max_size)
+        self.final_obs = RingBuffer(obs_shape, obs_dtype, 64, max_size)
+
+        self.buffers = [
+            self.obs, self.actions, self.rewards, self.dones, self.ends,
+            self.episode_returns, self.episode_lengths, self.episode_dones, self.final_obs
+        ]
+
+    def collect(self, agent, steps=None, episodes=None, episode_length=None, debug=False):
+        # Runs until steps steps or episodes episodes are done (whichever comes first), each
+        # episode lasting at most episode_length steps. The agent picks actions through
+        # act(ob, reward, done), and if it has one, observe(ob, action, reward, next_ob, done)
+        # is called after every step. The returned arrays are views that the next collect
+        # call overwrites
+        if steps is None and episodes is None:
+            raise Exception("Give a step or an episode budget")
+
+        for buf in self.buffers:
+            buf.clear()
+
+        env = self.env
+        observe = getattr(agent, "observe", None)
+
+        total_steps = 0
+        episode = 0
+
+        while (steps is None or total_steps < steps) and (episodes is None or episode < episodes):
+            if debug:
+                print("Starting Episode {0}".format(episode))
+
+            ob = env.reset()
+            reward = 0
+            done = False
+
+            episode_return = 0.0
+            length = 0
+
+            while not done and (episode_length is None or length < episode_length) and (steps is None or total_steps < steps):
+                action = agent.act(ob, reward, done)
+
+                # With copy_obs=False the env overwrites ob in place when it steps, so it is
+                # stored (and copied for observe) first
+                self.obs.append(ob)
+                if observe is not None and isinstance(ob, np.ndarray):
+                    ob = ob.copy()
+
+                next_ob, reward, done, _ = env.step(action)
+
+                if observe is not None:
+                    observe(ob, action, reward, next_ob, done)
+
+                self.actions.append(action)
+                self.rewards.append(reward)
+                self.dones.append(done)
+                self.ends.append(False)
+
+                episode_return += reward
+                length += 1
+                total_steps += 1
+
+                ob = next_ob
+
+            if length:
+                self.ends.set_last(True)
+
+            self.episode_returns.append(episode_return)
+            self.episode_lengths.append(length)
+            self.episode_dones.append(done)
+            self.final_obs.append(ob)
+
+            if debug:
+                print("Died? {0}".format(done))
+
+            episode += 1
+
+        return Rollout(*(buf.view() for buf in self.buffers))
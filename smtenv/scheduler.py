@@ -0,0 +1,67 @@
+import time
+
+class RenderScheduler:
+    # Decides which steps of a displayed game get drawn, separately from how fast the game is
+    # simulated. A step is drawn when all of the set conditions hold:
+    #
+    #   every=N       every Nth step of an episode (its first step included)
+    #   max_fps=X     at most X frames per wall-clock second
+    #   episodes=E    only episodes in E (a container of episode numbers counted from 0, or a
+    #                 callable taking the episode number)
+    #
+    # throttle_fps=T slows the simulation to at most T ticks per wall-clock second by sleeping;
+    # without it the game runs as fast as it can
+    def __init__(self, every=1, max_fps=None, episodes=None, throttle_fps=None):
+        if every < 1:
+            raise Exception("every must be at least 1, got {0}".format(every))
+
+        self.every = every
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.episodes = episodes
+        self.tick_interval = 1.0 / throttle_fps if throttle_fps else 0.0
+
+        self.episode = -1
+        self.step = 0
+        self.rendering = self._selected(0)
+        self.last_frame = None
+        self.next_tick = None
+
+    def _selected(self, episode):
+        if self.episodes is None:
+            return True
+        if callable(self.episodes):
+            return bool(self.episodes(episode))
+
+        return episode in self.episodes
+
+    def start_episode(self):
+        self.episode += 1
+        self.step = 0
+        self.rendering = self._selected(self.episode)
+
+    def should_render(self):
+        step = self.step
+        self.step += 1
+
+        if not self.rendering or step % self.every:
+            return False
+
+        if self.min_interval:
+            now = time.perf_counter()
+            if self.last_frame is not None and now - self.last_frame < self.min_interval:
+                return False
+            self.last_frame = now
+
+        return True
+
+    def throttle(self):
+        # Sleeps until the next tick is due, late ticks do not pile up into a burst
+        if not self.tick_interval:
+            return
+
+        now = time.perf_counter()
+        if self.next_tick is not None and now < self.next_tick:
+            time.sleep(self.next_tick - now)
+            now = self.next_tick
+
+        self.next_tick = now + self.tick_interval
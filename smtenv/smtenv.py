@@ -8,18 +8,29 @@ import numpy as np
 import sys, os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 
-import pygame
 from smtenv.basegame import BaseGame
+from smtenv.profiling import StepProfiler
+from smtenv.pixels import PixelObservation
+from smtenv.rollout import RolloutCollector
 
 class _GameWrapper:
     def __init__(self,
-                 game, lock_fps=False, fps=30, display=True, state_preprocessor=None):
+                 game, lock_fps=False, fps=30, display=True, state_preprocessor=None, obs_type="dict", copy_obs=True,
+                 profile=False, pixel_shape=None, grayscale=False, frame_skip=1, render_schedule=None):
         self.game = game
         self.fps = fps
         self.NOOP = None
         self.display = display
         self.lock_fps = lock_fps
 
+        if frame_skip < 1:
+            raise Exception("frame_skip must be at least 1, got {0}".format(frame_skip))
+        self.frame_skip = frame_skip
+
+        # With a RenderScheduler the game runs at a fixed dt of 1000 / fps ms, and draws only
+        # the steps the scheduler picks
+        self.render_schedule = render_schedule
+
         self.last_action = []
         self.action = []
         self.previous_score = 0
@@ -31,11 +42,58 @@ class _GameWrapper:
             class_name = self.game.__class__.__name__
             raise Exception("{0} is BaseGame: {1}".format(class_name, isinstance(self.game, BaseGame)))
         
+        # Actions go straight to the game instance unless it reads pygame's event queue itself
+        if type(self.game)._handle_player_events is BaseGame._handle_player_events:
+            self._do_action = self.game._set_action
+        else:
+            self._do_action = self.game._do_action
+
         self.game.setup(display=self.display)
         self.game.init()
 
+        self._actions = set(self.get_actions())
+
         self.state_preprocessor = state_preprocessor
 
+        # "dict" observations come from get_game_state (and the state_preprocessor), "array"
+        # ones are written by the game into one preallocated buffer, "pixels" ones are frames
+        self.obs_type = obs_type
+        self.copy_obs = copy_obs
+        self.obs_buffer = None
+        self.pixel_obs = None
+
+        if obs_type == "array":
+            low, high = self.game.get_observation_layout()
+            self.obs_buffer = np.zeros(low.shape, dtype=low.dtype)
+        elif obs_type == "pixels":
+            self.pixel_obs = PixelObservation(self.game, pixel_shape, grayscale)
+        elif obs_type != "dict":
+            raise Exception("Unknown observation type: {0}".format(obs_type))
+
+        self._game_step = self.game.step
+        self._game_draw = self.game._draw
+        self._get_state = self.game.get_game_state
+        self._fill_observation = self.game.fill_observation
+        self._preprocess = state_preprocessor
+        self._observe_pixels = self.pixel_obs.observe if self.pixel_obs is not None else None
+
+        # Profiling swaps the per-phase callables for timed ones; without it nothing is wrapped
+        self.profiler = None
+        if profile:
+            self.profiler = StepProfiler()
+
+            self._do_action = self.profiler.wrap("do_action", self._do_action)
+            self._tick = self.profiler.wrap("tick", self._tick)
+            self._game_step = self.profiler.wrap("step", self._game_step)
+            self._game_draw = self.profiler.wrap("draw", self._game_draw)
+            self._get_state = self.profiler.wrap("get_game_state", self._get_state)
+            self._fill_observation = self.profiler.wrap("get_game_state", self._fill_observation)
+            if self._observe_pixels is not None:
+                self._observe_pixels = self.profiler.wrap("get_game_state", self._observe_pixels)
+            if self._preprocess is not None:
+                self._preprocess = self.profiler.wrap("state_preprocessor", self._preprocess)
+            self.reset_game = self.profiler.wrap("reset_game", self.reset_game)
+
     def displayable(self):
         return self.display
 
@@ -44,6 +102,10 @@ class _GameWrapper:
         self.game._setup_display(display_flag)
 
     def _tick(self):
+        if self.render_schedule is not None:
+            self.render_schedule.throttle()
+            return 1000.0 / self.fps
+
         if not self.display or self.lock_fps:
             return 1000.0 / self.fps
         else:
@@ -72,75 +134,105 @@ class _GameWrapper:
         self.previous_score = 0.0
         self.game.reset()
 
+        if self.render_schedule is not None:
+            self.render_schedule.start_episode()
+
     def get_screen_dims(self):
         return self.game.get_screen_dims()
 
+    def get_observation_layout(self):
+        if self.pixel_obs is not None:
+            return self.pixel_obs.get_observation_layout()
+
+        return self.game.get_observation_layout()
+
     def get_game_state(self):
-        state = self.game.get_game_state()
+        if self._observe_pixels is not None:
+            obs = self._observe_pixels()
+            return obs.copy() if self.copy_obs else obs
+
+        if self.obs_buffer is not None:
+            self._fill_observation(self.obs_buffer)
+            return self.obs_buffer.copy() if self.copy_obs else self.obs_buffer
 
-        if self.state_preprocessor is not None:
-            return self.state_preprocessor(state)
+        state = self._get_state()
+
+        if self._preprocess is not None:
+            return self._preprocess(state)
         else:
             return state
 
     def act(self, action):
+        if self.profiler is not None:
+            self.profiler.begin_step()
+
         if self.game_over():
             return 0.0
         
-        if action not in self.get_actions():
+        if action not in self._actions:
             action = self.noop
         
         previous_score = self.score()
 
-        self.game._do_action(action)
-        dt = self._tick()
-        self.game.step(dt)
-        self.game._draw()
+        # The action is repeated for frame_skip ticks (games such as ATESim forget it after
+        # every update), only the last tick is drawn
+        for _ in range(self.frame_skip):
+            self._do_action(action)
+            dt = self._tick()
+            self._game_step(dt)
+
+            self.frame_count += 1
+            if self.game_over():
+                break
+
+        if self.render_schedule is None or self.render_schedule.should_render():
+            self._game_draw()
 
-        self.frame_count += 1
         rwd = self.score() - previous_score
 
         return rwd
 
 class SMTEnv(gym.Env):
     @staticmethod
-    def register(game, display_screen=True, state_preprocessor=lambda x: x, fps=30, **args):
+    def register(game, display_screen=True, state_preprocessor=lambda x: x, fps=30, obs_type="dict", copy_obs=True,
+                 profile=False, pixel_shape=None, grayscale=False, frame_skip=1, render_schedule=None, **args):
         game_name = game.__class__.__name__
 
         gym.envs.registration.register(
             id=game_name.lower() + "-v0",
             entry_point='smtenv:SMTEnv',
-            kwargs={'game_class': game, 'display_screen': display_screen, 'state_preprocessor': state_preprocessor, 'fps': fps, 'kwargs': args}
+            kwargs={'game_class': game, 'display_screen': display_screen, 'state_preprocessor': state_preprocessor, 'fps': fps,
+                    'obs_type': obs_type, 'copy_obs': copy_obs, 'profile': profile, 'pixel_shape': pixel_shape,
+                    'grayscale': grayscale, 'frame_skip': frame_skip, 'render_schedule': render_schedule,
+                    'kwargs': args}
         )
 
         return gym.make(game_name.lower() + "-v0")
 
     @staticmethod
     def run(env, agent, episode_count=5, episode_length=100, debug=False):
-        reward = 0
-        done = False
-
-        for i in range(episode_count):
-            if debug:
-                print("Starting Episode {0}".format(i))
-            
-            ob = env.reset()
-
-            for _ in range(episode_length):
-                action = agent.act(ob, reward, done)
-                ob, reward, done, _ = env.step(action)
-
-                if debug:
-                    print(ob)
-
-                if done:
-                    break
+        # Runs episode_count episodes and returns their transitions as a rollout.Rollout
+        rollout = RolloutCollector(env, capacity=episode_count * episode_length).collect(
+            agent, episodes=episode_count, episode_length=episode_length, debug=debug
+        )
 
-            if debug:
-                print("Died? {0}".format(done))
         env.close()
 
-    def __init__(self, game_class, display_screen=True, state_preprocessor=lambda x: x, fps=30, kwargs={}):
+        return rollout
+
+    # obs_type="array" makes observations fixed-shape arrays matching observation_space (the
+    # state_preprocessor is not used then), obs_type="pixels" makes them uint8 frames, drawn
+    # offscreen when there is no window, downscaled to pixel_shape=(height, width) and/or
+    # grayscale if asked. With copy_obs=False every step returns the same buffer, overwritten
+    # in place by the next step or reset. profile=True times every phase of step and reset
+    # (see profile_stats), and reports this step's times in info["profile"] (summed over its
+    # ticks, 0 for phases that did not run). frame_skip=N repeats every action for N game
+    # ticks (fewer if the game ends), summing their rewards.
+    # render_schedule takes a RenderScheduler, which picks the steps that get drawn while the
+    # game runs at a fixed dt of 1000 / fps ms, as fast as the scheduler's throttle allows
+    def __init__(self, game_class, display_screen=True, state_preprocessor=lambda x: x, fps=30, kwargs={},
+                 obs_type="dict", copy_obs=True, profile=False, pixel_shape=None, grayscale=False, frame_skip=1,
+                 render_schedule=None):
         # import importlib
         
         # game_module_name = game_name.lower()
@@ -148,10 +240,17 @@ class SMTEnv(gym.Env):
         # game_module = importlib.import_module(game_module_name)
         # game = getattr(game_module, game_name)(**kwargs)
         game = game_class(**kwargs)
-        self.game_state = _GameWrapper(game, fps=fps, display=display_screen, state_preprocessor=state_preprocessor)
+        self.game_state = _GameWrapper(game, fps=fps, display=display_screen, state_preprocessor=state_preprocessor,
+                                       obs_type=obs_type, copy_obs=copy_obs, profile=profile,
+                                       pixel_shape=pixel_shape, grayscale=grayscale, frame_skip=frame_skip,
+                                       render_schedule=render_schedule)
 
         self._action_set = self.game_state.get_actions()
         self.action_space = spaces.Discrete(len(self._action_set))
+
+        if obs_type != "dict":
+            low, high = self.game_state.get_observation_layout()
+            self.observation_space = spaces.Box(low, high, dtype=low.dtype)
         self.screen_height, self.screen_width = self.game_state.get_screen_dims()
 
         self.viewer = None
@@ -163,18 +262,48 @@ class SMTEnv(gym.Env):
         reward = self.game_state.act(self._action_set[a])
         state = self.game_state.get_game_state()
         terminal = self.game_state.game_over()
+
+        if self.game_state.profiler is not None:
+            return state, reward, terminal, {"profile": self.game_state.profiler.step_times()}
+
         return state, reward, terminal, {}
 
+    def get_state_snapshot(self):
+        # Immutable record of the game's dynamic state, see BaseGame.get_state_snapshot
+        return self.game_state.game.get_state_snapshot()
+
+    def restore_state_snapshot(self, snapshot):
+        # Puts the game back into a snapshot's state and returns its observation
+        self.game_state.game.restore_state_snapshot(snapshot)
+        return self.game_state.get_game_state()
+
+    def profile_stats(self):
+        # StepProfiler of this env, None unless it was created with profile=True
+        return self.game_state.profiler
+
     @property
     def _n_actions(self):
         return len(self._action_set)
 
-    def reset(self):
+    def seed(self, seed=None):
+        self.game_state.game.seed(seed)
+        return [seed]
+
+    def reset(self, seed=None):
+        # With a seed the game's generator restarts first, so the episode is reproducible
+        if seed is not None:
+            self.game_state.game.seed(seed)
+
         self.game_state.reset_game()
         state = self.game_state.get_game_state()
         return state
 
-    def render(self):
+    def render(self, mode="human"):
+        # "rgb_array" returns the current frame as a (height, width, 3) uint8 view, drawn
+        # offscreen when there is no window; it is overwritten by the next frame drawn
+        if mode == "rgb_array":
+            return self.game_state.game.render_frame()
+
         if self.game_state.displayable():
             self.game_state.game._draw()
     
\ No newline at end of file
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import itertools
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from smtenv.smtenv import SMTEnv
+
+# Envs built by worker_env in this process, reused by later cells that ask for the same one
+_envs = {}
+
+def grid(**axes):
+    # Every combination of the axes' values, as a list of cell dicts:
+    # grid(alpha=[0.1, 0.5], seed=[0, 1]) has four cells
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+def cell_key(cell):
+    # Cells must be JSON-serializable, equal cells have equal keys
+    return json.dumps(cell, sort_keys=True)
+
+def worker_env(game_class, kwargs={}, **env_args):
+    # One SMTEnv per worker process and configuration: the first call builds it, later calls
+    # (from later cells run by the same worker) get it back, to be reset by the caller
+    key = (game_class, json.dumps(kwargs, sort_keys=True, default=repr), json.dumps(env_args, sort_keys=True, default=repr))
+
+    if key not in _envs:
+        _envs[key] = SMTEnv(game_class, kwargs=kwargs, **env_args)
+
+    return _envs[key]
+
+def load_results(path):
+    # Rows of a results file, the last row of each cell only
+    rows = {}
+
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted sweep
+                    continue
+
+                rows[cell_key(row["cell"])] = row
+
+    return list(rows.values())
+
+def completed(path):
+    # Keys of the cells a results file holds a successful result for
+    return set(cell_key(row["cell"]) for row in load_results(path) if "error" not in row)
+
+def _run_cell(fn, cell):
+    start = time.perf_counter()
+
+    try:
+        row = {"cell": cell, "result": fn(cell)}
+    except Exception:
+        row = {"cell": cell, "error": traceback.format_exc()}
+
+    row["seconds"] = time.perf_counter() - start
+    row["pid"] = os.getpid()
+
+    return row
+
+def run_sweep(fn, cells, path, max_workers=None, max_pending=None, verbose=True):
+    # Runs fn(cell) for every cell without a successful result in path yet, over a pool of
+    # max_workers processes (default: all cores). fn must be importable by the workers (a
+    # module-level function) and return something JSON-serializable. Each finished cell is
+    # appended to path as one JSON line right away, failed cells record their traceback and
+    # are run again by the next sweep. At most max_pending cells are queued at a time.
+    # Returns the number of cells run
+    done = completed(path)
+    todo = [cell for cell in cells if cell_key(cell) not in done]
+
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * max_workers
+
+    if verbose:
+        print("{0} cells, {1} already done, running {2} on {3} workers".format(len(cells), len(cells) - len(todo), len(todo), max_workers))
+
+    if not todo:
+        return 0
+
+    finished = 0
+    queue = iter(todo)
+
+    with open(path, "a") as out, ProcessPoolExecutor(max_workers=max_workers) as pool:
+        # New rows start on a line of their own, after any line an interrupted sweep cut short
+        if out.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    out.write("\n")
+
+        pending = {}
+
+        while True:
+            for cell in itertools.islice(queue, max_pending - len(pending)):
+                pending[pool.submit(_run_cell, fn, cell)] = cell
+
+            if not pending:
+                break
+
+            ready, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in ready:
+                cell = pending.pop(future)
+
+                # A result that cannot cross the process boundary or be written counts as a failure
+                try:
+                    line = json.dumps(future.result())
+                except Exception:
+                    line = json.dumps({"cell": cell, "error": traceback.format_exc()})
+
+                row = json.loads(line)
+
+                out.write(line + "\n")
+                out.flush()
+
+                finished += 1
+                if verbose:
+                    status = "failed" if "error" in row else "{0:.1f}s".format(row.get("seconds", 0.0))
+                    print("[{0}/{1}] {2} {3}".format(finished, len(todo), cell_key(row["cell"]), status))
+                    sys.stdout.flush()
+
+    return finished
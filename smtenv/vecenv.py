@@ -0,0 +1,239 @@
+import os
+import traceback
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from gym import spaces
+
+from smtenv.smtenv import _GameWrapper
+
+def _split(num_envs, num_workers):
+    # [start, end) env index range owned by each worker
+    bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _layout(num_envs, shape, dtype):
+    # Shared buffers: observations, final observations of finished episodes, rewards, dones
+    return [
+        ((num_envs,) + shape, dtype),
+        ((num_envs,) + shape, dtype),
+        ((num_envs,), np.float64),
+        ((num_envs,), np.bool_)
+    ]
+
+def _worker(conn, game_class, kwargs, count, fps, state_preprocessor, obs_type, frame_skip):
+    try:
+        games = [
+            _GameWrapper(game_class(**kwargs), fps=fps, display=False, state_preprocessor=state_preprocessor,
+                         obs_type=obs_type, copy_obs=False, frame_skip=frame_skip)
+            for _ in range(count)
+        ]
+        action_set = games[0].get_actions()
+
+        for game in games:
+            game.reset_game()
+
+        first = np.asarray(games[0].get_game_state())
+        layout = games[0].get_observation_layout() if obs_type != "dict" else None
+        conn.send(("spec", first.shape, first.dtype.str, len(action_set), layout))
+
+        # Parent answers with the shared buffers and the slice of them this worker owns
+        _, names, num_envs, shape, dtype, start, end = conn.recv()
+
+        shms = [shared_memory.SharedMemory(name=name) for name in names]
+        obs, final_obs, rewards, dones = [
+            np.ndarray(arr_shape, dtype=arr_dtype, buffer=shm.buf)[start:end]
+            for shm, (arr_shape, arr_dtype) in zip(shms, _layout(num_envs, shape, dtype))
+        ]
+
+        for j, game in enumerate(games):
+            obs[j] = game.get_game_state()
+
+        conn.send(None)
+
+        while True:
+            cmd, data = conn.recv()
+
+            if cmd == "step":
+                for j, game in enumerate(games):
+                    rewards[j] = game.act(action_set[data[j]])
+                    obs[j] = game.get_game_state()
+                    dones[j] = game.game_over()
+
+                    # Finished episodes are restarted here, the parent only sees the flag
+                    if dones[j]:
+                        final_obs[j] = obs[j]
+                        game.reset_game()
+                        obs[j] = game.get_game_state()
+            elif cmd == "reset":
+                for j, game in enumerate(games):
+                    game.reset_game()
+                    obs[j] = game.get_game_state()
+                    rewards[j] = 0.0
+                    dones[j] = False
+
+            conn.send(None)
+
+            if cmd == "close":
+                break
+
+        # The views must go before the segments can be closed
+        del obs, final_obs, rewards, dones
+        for shm in shms:
+            shm.close()
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        conn.close()
+
+class SMTVectorEnv:
+    # Runs num_envs copies of a BaseGame in num_workers processes. Workers write observations,
+    # rewards and done flags straight into shared memory; only action indices cross the pipes.
+    # With obs_type="array" or "pixels" the declared observation layout is used. Otherwise observations
+    # (after state_preprocessor) must be fixed-shape numeric arrays; they are stored as
+    # obs_dtype, since the first observation alone cannot tell ints from floats. The
+    # state_preprocessor and kwargs are pickled into the workers under the "spawn" and
+    # "forkserver" start methods, so they must be module-level functions and plain data there.
+    def __init__(self, game_class, num_envs, num_workers=None, state_preprocessor=None, fps=30, kwargs={},
+                 obs_type="dict", obs_dtype=np.float64, copy=True, start_method=None, frame_skip=1):
+        self.num_envs = num_envs
+        self.copy = copy
+        self.closed = False
+
+        num_workers = min(num_envs, num_workers or os.cpu_count() or 1)
+        ctx = mp.get_context(start_method)
+
+        # Workers must share our resource tracker, a private one would unlink the shared
+        # buffers as soon as its worker exits
+        resource_tracker.ensure_running()
+
+        self.slices = _split(num_envs, num_workers)
+        self.pipes = []
+        self.procs = []
+
+        for start, end in self.slices:
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(
+                target=_worker,
+                args=(child, game_class, kwargs, end - start, fps, state_preprocessor, obs_type, frame_skip),
+                daemon=True
+            )
+            proc.start()
+            child.close()
+
+            self.pipes.append(parent)
+            self.procs.append(proc)
+
+        self._shm = []
+
+        try:
+            specs = [self._recv(pipe) for pipe in self.pipes]
+
+            _, shape, dtype, n_actions, layout = specs[0]
+            if any(spec[1:4] != specs[0][1:4] for spec in specs):
+                raise Exception("Workers disagree on the observation layout: {0}".format(specs))
+
+            if np.dtype(dtype) == object:
+                raise Exception("Observations must be fixed-shape numeric arrays, use a state_preprocessor")
+
+            if layout is not None:
+                low, high = layout
+                dtype = low.dtype
+            else:
+                dtype = np.dtype(obs_dtype)
+                low, high = -np.inf, np.inf
+
+            arrays = []
+            for arr_shape, arr_dtype in _layout(num_envs, shape, dtype):
+                nbytes = max(1, int(np.prod(arr_shape)) * np.dtype(arr_dtype).itemsize)
+                shm = shared_memory.SharedMemory(create=True, size=nbytes)
+
+                self._shm.append(shm)
+                arrays.append(np.ndarray(arr_shape, dtype=arr_dtype, buffer=shm.buf))
+
+            self.obs, self.final_obs, self.rewards, self.dones = arrays
+
+            names = [shm.name for shm in self._shm]
+            for pipe, (start, end) in zip(self.pipes, self.slices):
+                pipe.send(("attach", names, num_envs, shape, dtype, start, end))
+
+            for pipe in self.pipes:
+                self._recv(pipe)
+        except Exception:
+            self.close()
+            raise
+
+        self.action_space = spaces.Discrete(n_actions)
+        self.observation_space = spaces.Box(low, high, shape=shape, dtype=dtype)
+
+    def _recv(self, pipe):
+        msg = pipe.recv()
+
+        if isinstance(msg, tuple) and msg[0] == "error":
+            raise Exception("Worker failed:\n{0}".format(msg[1]))
+
+        return msg
+
+    def _sync(self):
+        for pipe in self.pipes:
+            self._recv(pipe)
+
+    def _result(self, arr):
+        return arr.copy() if self.copy else arr
+
+    def reset(self):
+        for pipe in self.pipes:
+            pipe.send(("reset", None))
+        self._sync()
+
+        return self._result(self.obs)
+
+    def step(self, actions):
+        # Returns (obs, rewards, dones, infos); done episodes are already reset, their last
+        # observation is kept in infos[i]["final_observation"]
+        actions = np.asarray(actions, dtype=np.int64)
+
+        for pipe, (start, end) in zip(self.pipes, self.slices):
+            pipe.send(("step", actions[start:end]))
+        self._sync()
+
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(self.dones):
+            infos[i]["final_observation"] = self.final_obs[i].copy()
+
+        return self._result(self.obs), self.rewards.copy(), self.dones.copy(), infos
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        for pipe, proc in zip(self.pipes, self.procs):
+            try:
+                if proc.is_alive():
+                    pipe.send(("close", None))
+                    pipe.recv()
+            except (EOFError, OSError, BrokenPipeError):
+                pass
+
+        for proc in self.procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+
+        self.obs = self.final_obs = self.rewards = self.dones = None
+        for shm in self._shm:
+            shm.unlink()
+            try:
+                shm.close()
+            except BufferError:
+                # Observations handed out with copy=False still point into the segment
+                pass
+        self._shm = []
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass